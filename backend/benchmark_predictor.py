@@ -0,0 +1,160 @@
+"""Benchmark TimeSeriesPredictor on synthetic series.
+
+Runs each predictor stage on trend + seasonality + noise series of increasing
+size, in both list-of-dicts and columnar input forms, and writes machine-readable
+timings and peak memory as JSON so runs can be compared across commits.
+
+    python benchmark_predictor.py --sizes 100 1000 10000 --output bench.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, Any, List, Callable
+
+import numpy as np
+import pandas as pd
+import statsmodels
+
+from ml.predictor import TimeSeriesPredictor
+
+STAGES = ("prepare_data", "detect_trend", "seasonal_decomposition", "forecast_arima", "analyze")
+INPUT_FORMS = ("records", "columnar")
+DATE_COLUMN = "date"
+VALUE_COLUMN = "value"
+
+
+def generate_series(n: int, freq: str = "h", slope: float = 0.05, season_period: int = 24,
+                    amplitude: float = 10.0, noise: float = 2.0, seed: int = 0) -> pd.DataFrame:
+    """Generate a synthetic trend + seasonality + noise series"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n, dtype=float)
+    values = 100 + slope * t + amplitude * np.sin(2 * np.pi * t / season_period) + rng.normal(0, noise, n)
+    return pd.DataFrame({
+        DATE_COLUMN: pd.date_range("2020-01-01", periods=n, freq=freq),
+        VALUE_COLUMN: values
+    })
+
+
+def to_input(df: pd.DataFrame, form: str):
+    """Convert a generated frame to the form uploads arrive in"""
+    frame = df.assign(**{DATE_COLUMN: df[DATE_COLUMN].dt.strftime("%Y-%m-%dT%H:%M:%S")})
+    if form == "records":
+        return frame.to_dict("records")
+    return {column: frame[column].tolist() for column in frame.columns}
+
+
+def stage_runner(stage: str, data, forecast_periods: int) -> Callable[[], Callable[[], Any]]:
+    """Build a setup function returning the timed call for one stage.
+
+    Setup (e.g. preparing data for the later stages) happens outside the
+    measurement, on a fresh predictor each repetition so no cached results leak.
+    """
+    def setup():
+        predictor = TimeSeriesPredictor()
+        if stage == "prepare_data":
+            return lambda: predictor.prepare_data(data, DATE_COLUMN, VALUE_COLUMN)
+        if stage == "analyze":
+            return lambda: predictor.analyze(data, DATE_COLUMN, VALUE_COLUMN, forecast_periods)
+
+        predictor.prepare_data(data, DATE_COLUMN, VALUE_COLUMN)
+        if stage == "forecast_arima":
+            return lambda: predictor.forecast_arima(forecast_periods)
+        return getattr(predictor, stage)
+
+    return setup
+
+
+def measure(setup: Callable[[], Callable[[], Any]], repeat: int) -> Dict[str, Any]:
+    """Time a call several times, then measure its peak memory in one extra traced run"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        call = setup()
+        started = time.perf_counter()
+        result = call()
+        timings.append(time.perf_counter() - started)
+
+    # tracemalloc slows execution, so memory is measured separately from timing
+    call = setup()
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    succeeded = not (isinstance(result, dict) and result.get("success") is False)
+    return {
+        "minSeconds": round(min(timings), 6),
+        "medianSeconds": round(statistics.median(timings), 6),
+        "maxSeconds": round(max(timings), 6),
+        "peakMemoryBytes": peak,
+        "succeeded": succeeded
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(sizes: List[int], stages: List[str], forms: List[str], repeat: int,
+                   forecast_periods: int, max_model_points: int) -> Dict[str, Any]:
+    results = []
+    for size in sizes:
+        df = generate_series(size)
+        for form in forms:
+            data = to_input(df, form)
+            for stage in stages:
+                record = {"stage": stage, "inputForm": form, "points": size}
+                # Model fitting on the largest series takes minutes; skip unless asked for
+                if stage in ("forecast_arima", "analyze") and size > max_model_points:
+                    record["skipped"] = f"exceeds --max-model-points ({max_model_points})"
+                else:
+                    record.update(measure(stage_runner(stage, data, forecast_periods), repeat))
+                results.append(record)
+                print(json.dumps(record), file=sys.stderr)
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "commit": git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "statsmodels": statsmodels.__version__,
+            "machine": platform.machine()
+        },
+        "settings": {"repeat": repeat, "forecastPeriods": forecast_periods, "maxModelPoints": max_model_points},
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TimeSeriesPredictor on synthetic series")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--forms", nargs="+", choices=INPUT_FORMS, default=list(INPUT_FORMS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--forecast-periods", type=int, default=30)
+    parser.add_argument("--max-model-points", type=int, default=100_000)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.stages, args.forms, args.repeat, args.forecast_periods, args.max_model_points)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
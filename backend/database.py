@@ -117,6 +117,25 @@ async def create_indexes():
         IndexModel([("created_at", DESCENDING)]),
     ]
     
+    # Predictions collection indexes (latest model state per series)
+    predictions_indexes = [
+        IndexModel([("datasetId", ASCENDING), ("parameters.dateColumn", ASCENDING), ("parameters.seriesKey", ASCENDING), ("createdAt", DESCENDING)]),
+    ]
+    
+    # Dataset row chunks, read in order per dataset and found by row range
+    dataset_chunks_indexes = [
+        IndexModel([("datasetId", ASCENDING), ("chunk", ASCENDING)], unique=True),
+        IndexModel([("datasetId", ASCENDING), ("rowStart", ASCENDING)]),
+    ]
+    
+    # Prediction result cache indexes (expired entries are removed by the TTL index)
+    prediction_cache_indexes = [
+        IndexModel([("key", ASCENDING)], unique=True),
+        IndexModel([("datasetId", ASCENDING)]),
+        IndexModel([("createdAt", ASCENDING)]),
+        IndexModel([("expiresAt", ASCENDING)], expireAfterSeconds=0),
+    ]
+    
     try:
         # Create indexes for all collections
         await db.products.create_indexes(products_indexes)
@@ -126,6 +145,9 @@ async def create_indexes():
         await db.external_signals.create_indexes(signals_indexes)
         await db.forecasts.create_indexes(forecasts_indexes)
         await db.inventory_alerts.create_indexes(alerts_indexes)
+        await db.predictions.create_indexes(predictions_indexes)
+        await db.prediction_cache.create_indexes(prediction_cache_indexes)
+        await db.dataset_chunks.create_indexes(dataset_chunks_indexes)
         
         logger.info("Successfully created all database indexes")
         
@@ -20,6 +20,9 @@ try:
 except ImportError:
     HAS_WEBSOCKET = False
 from models import *
+from ml.executor import predictor_executor
+from ml.warmup import predictor_warmup
+from services.job_service import job_scheduler
 
 # Import routes
 from routes import auth, data, predict, admin
@@ -33,6 +36,9 @@ async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongo()
     await create_indexes()
+    await job_scheduler.start()
+    # Load the ML stack in the background; readiness does not wait for it
+    predictor_warmup.start()
     if HAS_WEBSOCKET:
         await data_generator.start()
     logger.info("Application startup complete")
@@ -42,6 +48,9 @@ async def lifespan(app: FastAPI):
     # Shutdown
     if HAS_WEBSOCKET:
         await data_generator.stop()
+    await job_scheduler.stop()
+    await predictor_warmup.stop()
+    predictor_executor.shutdown()
     await close_mongo_connection()
     logger.info("Application shutdown complete")
 
@@ -117,7 +126,8 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "connections": connections
+        "connections": connections,
+        "predictor": predictor_warmup.get_status()
     }
 
 @app.get("/api/products")
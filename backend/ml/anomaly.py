@@ -0,0 +1,68 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Optional, Tuple
+
+# Scales the MAD (or the mean absolute deviation) to the standard deviation of normal data
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+# Windows processed per block, bounding the temporary copies made by partitioning
+CHUNK_WINDOWS = 1 << 12
+
+
+def _window_stats(windows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Median and MAD of every row of a (possibly strided) view of windows of odd length"""
+    middle = windows.shape[1] // 2
+    medians = np.empty(len(windows))
+    mads = np.empty(len(windows))
+    for start in range(0, len(windows), CHUNK_WINDOWS):
+        block = np.partition(windows[start:start + CHUNK_WINDOWS], middle, axis=1)
+        stop = start + len(block)
+        # A partial sort around the middle element is enough for an odd window
+        medians[start:stop] = block[:, middle]
+        block = np.abs(block - medians[start:stop, None], out=block)
+        block.partition(middle, axis=1)
+        mads[start:stop] = block[:, middle]
+    return medians, mads
+
+
+def rolling_robust_zscore(values: np.ndarray, window: int, step: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Robust z-score of every point against a centered rolling median and MAD.
+
+    Windows are strided views of the series, so no per-row Python work is done.
+    For long windows the statistics barely move from one point to the next:
+    they are evaluated every step windows (window // 16 by default) and
+    interpolated in between. Points within half a window of either end use the
+    nearest full window. Where a window's MAD is zero (mostly constant data)
+    the series-wide MAD, or failing that its mean absolute deviation, is used.
+    Returns the z-scores and the rolling medians.
+    """
+    values = np.ascontiguousarray(values, dtype=float)
+    n = len(values)
+    window = min(window | 1, n if n % 2 else n - 1)
+    if window < 3:
+        return np.zeros(n), values.copy()
+
+    step = max(1, step or window // 16)
+    windows = sliding_window_view(values, window)
+    starts = np.arange(0, len(windows), step)
+    if starts[-1] != len(windows) - 1:
+        starts = np.append(starts, len(windows) - 1)
+    medians, mads = _window_stats(windows[starts])
+
+    # Back to one value per point; np.interp holds the edge windows' values
+    if step > 1 or len(starts) != n:
+        centers = starts + window // 2
+        positions = np.arange(n)
+        medians = np.interp(positions, centers, medians)
+        mads = np.interp(positions, centers, mads)
+
+    deviations = values - medians
+    global_deviation = np.abs(values - np.median(values))
+    global_mad = float(np.median(global_deviation))
+    fallback = MAD_SCALE * global_mad if global_mad > 0 else MEAN_AD_SCALE * float(global_deviation.mean())
+    scale = np.where(mads > 0, MAD_SCALE * mads, fallback)
+
+    zscores = np.zeros(n)
+    np.divide(deviations, scale, out=zscores, where=scale > 0)
+    return zscores, medians
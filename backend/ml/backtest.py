@@ -0,0 +1,116 @@
+import warnings
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from statsmodels.tsa.arima.model import ARIMA
+
+def _run_fold(values: np.ndarray, origin: int, horizon: int, order: Tuple[int, int, int],
+              alpha: float = 0.05) -> Dict[str, Any]:
+    """Fit on the series up to origin and forecast the next horizon points"""
+    train = values[:origin]
+    actual = values[origin:origin + horizon]
+    try:
+        fitted = ARIMA(train, order=order).fit()
+        forecast = fitted.get_forecast(steps=len(actual))
+        intervals = np.asarray(forecast.conf_int(alpha=alpha))
+        return {
+            "origin": origin,
+            "actual": actual,
+            "predicted": np.asarray(forecast.predicted_mean),
+            "lower": intervals[:, 0],
+            "upper": intervals[:, 1]
+        }
+    except Exception as e:
+        return {"origin": origin, "error": str(e)}
+
+
+def _score(actual: np.ndarray, predicted: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> Dict[str, Optional[float]]:
+    """Accuracy metrics for one set of forecasts"""
+    errors = predicted - actual
+    nonzero = actual != 0
+    denominator = np.abs(actual) + np.abs(predicted)
+    valid = denominator > 0
+    return {
+        "mape": float(np.mean(np.abs(errors[nonzero] / actual[nonzero])) * 100) if nonzero.any() else None,
+        "smape": float(np.mean(2 * np.abs(errors[valid]) / denominator[valid]) * 100) if valid.any() else 0.0,
+        "rmse": float(np.sqrt(np.mean(errors ** 2))),
+        "coverage": float(np.mean((actual >= lower) & (actual <= upper)) * 100)
+    }
+
+
+def insufficient_data_error(horizon: int, min_train: int = 20) -> str:
+    return f"Insufficient data for backtesting (need at least {min_train + horizon} data points)"
+
+
+def fold_origins(n: int, horizon: int, folds: int, step: int, min_train: int = 20) -> List[int]:
+    """Fold origins in ascending order: the last leaves exactly horizon points for evaluation, earlier ones
+    step back by step points, and origins leaving fewer than min_train training points are dropped"""
+    origins = [n - horizon - step * k for k in range(folds)][::-1]
+    return [origin for origin in origins if origin >= min_train]
+
+
+def fold_batches(origins: List[int], workers: int) -> List[List[int]]:
+    """Split fold origins into batches to run as concurrent jobs.
+
+    Later folds train on more points and take longer, so origins are dealt
+    round-robin to keep the batches' work even.
+    """
+    count = min(len(origins), max(workers, 1) * 4)
+    return [origins[k::count] for k in range(count)]
+
+
+def run_folds(values: np.ndarray, origins: List[int], horizon: int,
+              order: Tuple[int, int, int]) -> List[Dict[str, Any]]:
+    """Run the folds at origins, in any subset of a backtest's origins"""
+    values = np.ascontiguousarray(values, dtype=float)
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore')
+        return [_run_fold(values, origin, horizon, order) for origin in origins]
+
+
+def summarize_folds(results: List[Dict[str, Any]], horizon: int, step: int,
+                    order: Tuple[int, int, int]) -> Dict[str, Any]:
+    """Score every fold and the pooled forecasts of a backtest's fold results"""
+    results = sorted(results, key=lambda result: result["origin"])
+    fold_results: List[Dict[str, Any]] = []
+    scored = [result for result in results if "error" not in result]
+    for result in results:
+        if "error" in result:
+            fold_results.append({"origin": result["origin"], "error": result["error"]})
+        else:
+            fold_results.append({
+                "origin": result["origin"],
+                "horizon": len(result["actual"]),
+                **_score(result["actual"], result["predicted"], result["lower"], result["upper"])
+            })
+
+    if not scored:
+        return {"success": False, "error": "All backtest folds failed", "folds": fold_results}
+
+    # Pool every fold's forecasts for the overall metrics
+    overall = _score(*(np.concatenate([result[key] for result in scored]) for key in ("actual", "predicted", "lower", "upper")))
+
+    return {
+        "success": True,
+        "order": "({},{},{})".format(*order),
+        "horizon": horizon,
+        "step": step,
+        "foldCount": len(results),
+        "metrics": overall,
+        "folds": fold_results
+    }
+
+
+def rolling_origin_backtest(values: np.ndarray, horizon: int = 7, folds: int = 5, step: Optional[int] = None,
+                            order: Tuple[int, int, int] = (1, 1, 1), min_train: int = 20) -> Dict[str, Any]:
+    """Rolling-origin cross-validation of an ARIMA order, running the folds in this process.
+
+    The routes run the folds in batches as concurrent jobs instead (see
+    ml.executor.backtest).
+    """
+    step = step or horizon
+    origins = fold_origins(len(values), horizon, folds, step, min_train)
+    if not origins:
+        return {"success": False, "error": insufficient_data_error(horizon, min_train)}
+
+    return summarize_folds(run_folds(values, origins, horizon, order), horizon, step, order)
@@ -0,0 +1,364 @@
+import io
+import json
+import os
+import shutil
+from typing import Dict, Any, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SCHEMA_FILE = "schema.json"
+
+# Rows copied at a time when turning raw column files into sorted .npy files
+COPY_BLOCK_ROWS = 1 << 20
+
+
+def parse_date_bound(value: str, timezone: Optional[str]) -> "pd.Timestamp":
+    """Parse a date range bound to compare with dates in a time zone (None for naive dates).
+
+    A naive bound is wall time in the dates' zone; an aware bound compared
+    with naive dates is taken in UTC.
+    """
+    import pandas as pd
+
+    bound = pd.Timestamp(value)
+    if timezone:
+        return bound.tz_localize(timezone) if bound.tzinfo is None else bound.tz_convert(timezone)
+    return bound.tz_convert("UTC").tz_localize(None) if bound.tzinfo is not None else bound
+
+
+def parse_dates(values: "pd.Series", date_format: Optional[str] = None, errors: str = "raise") -> "pd.Series":
+    """Parse a column of dates with its inferred format, if it has one.
+
+    Values the format does not fit fall back to pandas' own parsing.
+    """
+    import pandas as pd
+
+    if date_format:
+        if pd.api.types.is_numeric_dtype(values):
+            # e.g. 20240131 stored as an integer
+            values = values.astype(str)
+        try:
+            return pd.to_datetime(values, format=date_format)
+        except (ValueError, TypeError):
+            pass
+    return pd.to_datetime(values, errors=errors)
+
+
+class ColumnarDataset:
+    """A dataset stored on disk as one typed .npy file per column.
+
+    Numeric columns are float64 and the date column is datetime64[ns], so
+    loads need no parsing. Columns are opened memory-mapped: the pages are
+    shared with the OS cache and only read when touched. Rows are sorted by
+    the date column when written. The object pickles as its path and schema,
+    so sending it to a predictor worker process costs nothing; the worker maps
+    the files itself.
+    """
+
+    def __init__(self, path: str, schema: Dict[str, Any], rows: Optional[Tuple[int, int]] = None):
+        self.path = path
+        self.schema = schema
+        # Row window [start, stop) that column() slices to, e.g. a date range
+        self.rows = rows or (0, schema["rowCount"])
+
+    @classmethod
+    def open(cls, path: str) -> Optional["ColumnarDataset"]:
+        """Open a stored dataset, or None if it is not on this host"""
+        try:
+            with open(os.path.join(path, SCHEMA_FILE)) as f:
+                return cls(path, json.load(f))
+        except FileNotFoundError:
+            return None
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.schema["columns"])
+
+    @property
+    def date_column(self) -> Optional[str]:
+        return self.schema.get("dateColumn")
+
+    def __len__(self) -> int:
+        return self.rows[1] - self.rows[0]
+
+    def has_columns(self, *columns: str) -> bool:
+        return all(column in self.schema["columns"] for column in columns)
+
+    def column(self, name: str) -> np.ndarray:
+        """Get a column as a read-only memory-mapped array"""
+        column = self.schema["columns"][name]
+        start, stop = self.rows
+        return np.load(os.path.join(self.path, column["file"]), mmap_mode="r")[start:stop]
+
+    def select_dates(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> "ColumnarDataset":
+        """Restrict to rows dated within [start_date, end_date] (inclusive).
+
+        Rows are in date order, so the window is found by binary search and
+        nothing is copied.
+        """
+        dates = self.column(self.date_column)
+        timezone = self.schema["columns"][self.date_column].get("timezone")
+
+        def position(value: str, side: str) -> int:
+            bound = parse_date_bound(value, timezone)
+            if bound.tzinfo is not None:
+                bound = bound.tz_convert("UTC").tz_localize(None)
+            return int(np.searchsorted(dates, bound.to_datetime64(), side=side))
+
+        start = position(start_date, "left") if start_date else 0
+        stop = position(end_date, "right") if end_date else len(dates)
+        offset = self.rows[0]
+        return ColumnarDataset(self.path, self.schema, (offset + start, offset + max(start, stop)))
+
+    def date_index(self, name: str) -> "pd.DatetimeIndex":
+        """Get a datetime column as an index, restoring its time zone"""
+        import pandas as pd
+
+        index = pd.DatetimeIndex(self.column(name), name=name)
+        timezone = self.schema["columns"][name].get("timezone")
+        return index.tz_localize("UTC").tz_convert(timezone) if timezone else index
+
+
+class ColumnarWriter:
+    """Builds a columnar dataset from a stream of dataframe chunks.
+
+    Column values are appended to raw files as chunks arrive, so memory is
+    bounded by the chunk size. The column set is fixed by the first chunk:
+    numeric columns stay stored while every chunk keeps them numeric, and the
+    date column while every chunk parses to dates in the same time zone (mixed
+    offsets parse to objects and are left to the row chunks). On close the raw
+    files become .npy files, reordered by date in blocks if the chunks were
+    not already in date order.
+
+    Given a stored dataset (base), the chunks are appended to it instead. The
+    base's columns are kept while the new rows fit them; new rows dated after
+    the stored ones extend the .npy files in place, so an append costs
+    O(new rows). The previous schema stays in effect until close writes the
+    new one.
+    """
+
+    def __init__(self, path: str, date_column: Optional[str], date_format: Optional[str] = None,
+                 base: Optional[ColumnarDataset] = None):
+        self.path = path
+        self.date_column = date_column
+        self.date_format = date_format
+        self.row_count = 0
+        self.numeric_columns: Optional[List[str]] = None
+        self._base = base
+        self._base_rows = base.schema["rowCount"] if base is not None else 0
+        self._files: Dict[str, Any] = {}
+        self._positions: Dict[str, int] = {}
+        self._timezone: Optional[str] = None
+        self._sorted = True
+        self._last_date: Optional[np.datetime64] = None
+        self._closed = False
+        if base is not None:
+            self.date_column = base.date_column
+            if self.date_column is not None:
+                self._timezone = base.schema["columns"][self.date_column].get("timezone")
+                if self._base_rows:
+                    self._last_date = base.column(self.date_column)[-1]
+
+    def _parse_dates(self, column: "pd.Series") -> Optional[np.ndarray]:
+        import pandas as pd
+
+        dates = parse_dates(column, self.date_format, errors="coerce")
+        if not pd.api.types.is_datetime64_any_dtype(dates) or dates.isna().any():
+            return None
+        timezone = str(dates.dt.tz) if dates.dt.tz is not None else None
+        if (self.row_count or self._base_rows) and timezone != self._timezone:
+            return None
+        self._timezone = timezone
+        if timezone:
+            dates = dates.dt.tz_convert("UTC").dt.tz_localize(None)
+        return dates.to_numpy(dtype="datetime64[ns]")
+
+    def _drop(self, name: str):
+        self._files.pop(name).close()
+        os.remove(os.path.join(self.path, f"{self._positions[name]}.raw"))
+
+    def append(self, df: "pd.DataFrame"):
+        """Append a chunk of rows"""
+        import pandas as pd
+
+        if self.numeric_columns is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._positions = {name: position for position, name in enumerate(df.columns)}
+            self.numeric_columns = [
+                name for name in df.columns
+                if name != self.date_column and pd.api.types.is_numeric_dtype(df[name]) and not pd.api.types.is_bool_dtype(df[name])
+                and (self._base is None or self._base.has_columns(str(name)))
+            ]
+            stored = self.numeric_columns + ([self.date_column] if self.date_column is not None else [])
+            self._files = {name: open(os.path.join(self.path, f"{self._positions[name]}.raw"), "wb") for name in stored}
+
+        if self.date_column in self._files:
+            dates = self._parse_dates(df[self.date_column])
+            if dates is None:
+                self._drop(self.date_column)
+            else:
+                if len(dates):
+                    self._sorted = self._sorted and (self._last_date is None or dates[0] >= self._last_date) \
+                        and bool((dates[1:] >= dates[:-1]).all())
+                    self._last_date = dates[-1]
+                dates.tofile(self._files[self.date_column])
+
+        for name in list(self.numeric_columns):
+            if not pd.api.types.is_numeric_dtype(df[name]) or pd.api.types.is_bool_dtype(df[name]):
+                self.numeric_columns.remove(name)
+                self._drop(name)
+                continue
+            df[name].to_numpy(dtype=np.float64).tofile(self._files[name])
+
+        self.row_count += len(df)
+
+    def _stored(self, name: str) -> Optional[np.ndarray]:
+        """The base's values of a column, if any"""
+        if not self._base_rows:
+            return None
+        return np.load(os.path.join(self.path, self._base.schema["columns"][str(name)]["file"]), mmap_mode="r")
+
+    def close(self) -> Dict[str, Any]:
+        """Finish the .npy files and write the schema. Returns the schema."""
+        for f in self._files.values():
+            f.close()
+        self._closed = True
+
+        total = self._base_rows + self.row_count
+        dates_stored = self.date_column in self._files
+        order = None
+        if dates_stored and not self._sorted:
+            dates = np.memmap(os.path.join(self.path, f"{self._positions[self.date_column]}.raw"), dtype="datetime64[ns]", mode="r")
+            stored = self._stored(self.date_column)
+            order = np.argsort(dates if stored is None else np.concatenate([stored, dates]), kind="stable")
+            del dates, stored
+
+        columns: Dict[str, Any] = {}
+        replaced = []
+        for name in self._files:
+            dtype = "datetime64[ns]" if name == self.date_column else "float64"
+            raw_path = os.path.join(self.path, f"{self._positions[name]}.raw")
+            filename = f"{self._positions[name]}.npy"
+            extended = False
+            if self._base_rows:
+                previous = self._base.schema["columns"][str(name)]["file"]
+                extended = order is None and _extend_npy(os.path.join(self.path, previous), raw_path, self._base_rows, total)
+                if extended:
+                    filename = previous
+                else:
+                    # Rewritten under a new name: readers of the previous schema keep their file
+                    filename = f"{self._positions[name]}.{total}.npy"
+                    replaced.append(previous)
+            if not extended:
+                self._write_npy(os.path.join(self.path, filename), raw_path, self._stored(name), dtype, total, order)
+            os.remove(raw_path)
+            columns[str(name)] = {"file": filename, "dtype": dtype}
+            if name == self.date_column:
+                columns[str(name)]["timezone"] = self._timezone
+
+        if self._base is not None:
+            # Columns the new rows no longer fit are dropped, as on upload
+            replaced += [column["file"] for name, column in self._base.schema["columns"].items() if name not in columns]
+
+        schema = {
+            "version": 1,
+            "rowCount": total,
+            "dateColumn": self.date_column if dates_stored else None,
+            "columns": columns
+        }
+        # The schema is written last: a directory without one is incomplete and ignored
+        with open(os.path.join(self.path, SCHEMA_FILE + ".tmp"), "w") as f:
+            json.dump(schema, f)
+        os.replace(os.path.join(self.path, SCHEMA_FILE + ".tmp"), os.path.join(self.path, SCHEMA_FILE))
+        for filename in replaced:
+            os.remove(os.path.join(self.path, filename))
+        return schema
+
+    def _write_npy(self, path: str, raw_path: str, stored: Optional[np.ndarray], dtype: str, total: int,
+                   order: Optional[np.ndarray]):
+        """Write stored values followed by the raw ones, reordered by order, in blocks"""
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(total,))
+        if self.row_count:
+            raw = np.memmap(raw_path, dtype=dtype, mode="r")
+            offset = len(stored) if stored is not None else 0
+            for start in range(0, total, COPY_BLOCK_ROWS):
+                stop = min(start + COPY_BLOCK_ROWS, total)
+                if order is None:
+                    if start < offset:
+                        out[start:min(stop, offset)] = stored[start:min(stop, offset)]
+                    if stop > offset:
+                        out[max(start, offset):stop] = raw[max(start, offset) - offset:stop - offset]
+                else:
+                    block = order[start:stop]
+                    old = block < offset
+                    values = np.empty(len(block), dtype=dtype)
+                    if offset:
+                        values[old] = stored[block[old]]
+                    values[~old] = raw[block[~old] - offset]
+                    out[start:stop] = values
+            del raw
+        elif stored is not None:
+            out[:] = stored
+        out.flush()
+        del out
+
+    def abort(self):
+        """Close and remove everything written so far.
+
+        When appending, the stored dataset is left as it was, unless close
+        has already run: the whole copy is then removed, and reads fall back
+        to the row chunks.
+        """
+        for f in self._files.values():
+            f.close()
+        if self._base is None or self._closed:
+            shutil.rmtree(self.path, ignore_errors=True)
+            return
+        for name in self._files:
+            try:
+                os.remove(os.path.join(self.path, f"{self._positions[name]}.raw"))
+            except FileNotFoundError:
+                pass
+
+
+def _extend_npy(path: str, raw_path: str, rows: int, total: int) -> bool:
+    """Append a raw file's values to a 1-d .npy file of rows values in place.
+
+    Returns False, leaving the file as it was, if the longer shape does not
+    fit in the existing header (it is padded, so it nearly always does).
+    """
+    with open(path, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            read_header, write_header = np.lib.format.read_array_header_1_0, np.lib.format.write_array_header_1_0
+        elif version == (2, 0):
+            read_header, write_header = np.lib.format.read_array_header_2_0, np.lib.format.write_array_header_2_0
+        else:
+            return False
+        _, fortran_order, dtype = read_header(f)
+        offset = f.tell()
+
+        header = io.BytesIO()
+        write_header(header, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": fortran_order, "shape": (total,)})
+        if header.tell() != offset:
+            return False
+
+        # Data first: until the header grows, readers see the previous length
+        f.seek(offset + rows * dtype.itemsize)
+        f.truncate()
+        with open(raw_path, "rb") as raw:
+            shutil.copyfileobj(raw, f)
+        f.flush()
+        f.seek(0)
+        f.write(header.getvalue())
+    return True
+
+
+def write_columnar(path: str, df: "pd.DataFrame", date_column: Optional[str], date_format: Optional[str] = None) -> Dict[str, Any]:
+    """Store the numeric columns and the date column of a dataframe under path. Returns the schema."""
+    writer = ColumnarWriter(path, date_column, date_format)
+    writer.append(df)
+    return writer.close()
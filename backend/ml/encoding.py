@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Optional
+
+
+def lttb_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """Pick indices with Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last points and, per bucket, the point forming the
+    largest triangle with the previously kept point and the next bucket's mean,
+    which preserves the visual shape of a line chart.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = edges[bucket + 1], edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+
+        # Twice the triangle area for every candidate in the bucket at once
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return selected
+
+
+def encode_dates(index: pd.DatetimeIndex) -> Dict[str, Any]:
+    """Encode dates as epoch milliseconds, using start/step when evenly spaced"""
+    epoch_ms = index.values.astype('datetime64[ms]').astype(np.int64)
+    if len(epoch_ms) > 1:
+        steps = np.diff(epoch_ms)
+        if np.all(steps == steps[0]):
+            return {"start": int(epoch_ms[0]), "step": int(steps[0]), "count": len(epoch_ms)}
+    return {"epochMs": epoch_ms.tolist()}
+
+
+def encode_values(values: np.ndarray, precision: Optional[int] = None) -> List[Optional[float]]:
+    """Encode a float array as a list, rounding and mapping NaN to None"""
+    values = np.asarray(values, dtype=float)
+    if precision is not None:
+        values = np.round(values, precision)
+    encoded = values.tolist()
+    if np.isnan(values).any():
+        encoded = [None if value != value else value for value in encoded]
+    return encoded
+
+
+def encode_columns(index: pd.DatetimeIndex, columns: Dict[str, np.ndarray], precision: Optional[int] = None,
+                   max_points: Optional[int] = None, shape_column: Optional[str] = None) -> Dict[str, Any]:
+    """Encode aligned series as columnar arrays with compact dates.
+
+    When max_points is set the rows are downsampled with LTTB on shape_column
+    (the first column by default), keeping the same rows for every column.
+    """
+    if max_points and len(index) > max_points:
+        shape = columns[shape_column or next(iter(columns))]
+        keep = lttb_indices(np.nan_to_num(np.asarray(shape, dtype=float)), max_points)
+        index = index[keep]
+        columns = {name: np.asarray(values)[keep] for name, values in columns.items()}
+
+    return {
+        "dates": encode_dates(index),
+        "columns": {name: encode_values(values, precision) for name, values in columns.items()}
+    }
@@ -0,0 +1,400 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+from ml.profiling import StageProfiler
+
+# The ML stack (pandas, statsmodels) is imported by the job functions on first
+# use, so the API process starts without it; see ml.warmup
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    from ml.predictor import TimeSeriesPredictor
+
+logger = logging.getLogger(__name__)
+
+# Execution modes: "process" runs predictor work in a process pool so CPU-bound
+# model fits never block the event loop, "thread" uses a thread pool (useful on
+# hosts where forking is unavailable) and "inline" keeps the old synchronous behaviour.
+EXECUTION_MODES = ("process", "thread", "inline")
+
+# Worker processes are started fresh ("forkserver", or "spawn" where that is
+# unavailable) rather than forked from the API process, whose motor and
+# warm-up threads a fork would copy mid-flight
+DEFAULT_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class PredictionTimeoutError(Exception):
+    """Raised when a predictor job exceeds its timeout"""
+
+
+# Job functions executed inside the worker. They must live at module level so
+# they can be pickled by the process pool. Each result carries the predictor's
+# per-stage timings, which the routes strip before caching.
+
+def _create_predictor(options: Optional[Dict[str, Any]]) -> "TimeSeriesPredictor":
+    from ml.predictor import TimeSeriesPredictor
+    return TimeSeriesPredictor(**(options or {}))
+
+
+def _with_timings(predictor: "TimeSeriesPredictor", result: Dict[str, Any]) -> Dict[str, Any]:
+    return {**result, "timings": predictor.profiler.report()}
+
+
+def run_analysis(data: Any, date_column: str, value_column: str, forecast_periods: int = 30,
+                 options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run the complete analysis pipeline"""
+    predictor = _create_predictor(options)
+    return predictor.analyze(data, date_column, value_column, forecast_periods)
+
+
+def run_prepare(data: Any, date_column: str, value_column: str, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Prepare a series and pick its model tier, so later jobs can take the series as is"""
+    predictor = _create_predictor(options)
+    try:
+        with predictor.profiler.stage("prepare"):
+            predictor.prepare_data(data, date_column, value_column)
+        with predictor.profiler.stage("model_selection"):
+            model, _ = predictor.select_model()
+        result = {"success": True, "series": predictor._get_series(), "model": model}
+    except Exception as e:
+        result = {"success": False, "error": f"Error preparing data: {str(e)}"}
+    return _with_timings(predictor, result)
+
+
+def run_differencing(values: "np.ndarray", max_d: int = 2) -> int:
+    """Pick the differencing order of an ARIMA order search"""
+    from ml.order_search import select_differencing
+    return select_differencing(values, max_d)
+
+
+def run_order_candidate(values: "np.ndarray", order: Tuple[int, int, int]) -> Tuple[Tuple[int, int, int], float, float]:
+    """Fit one candidate of an ARIMA order search"""
+    from ml.order_search import fit_candidate
+    return fit_candidate(values, order)
+
+
+def run_trend(data: List[Dict[str, Any]], date_column: str, value_column: str, mode: str = "full", method: str = "ols",
+              options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run trend detection ("full" decomposes first, "fast" works on the raw series)"""
+    predictor = _create_predictor(options)
+    with predictor.profiler.stage("prepare"):
+        predictor.prepare_data(data, date_column, value_column)
+    with predictor.profiler.stage("trend"):
+        result = predictor.detect_trend_fast(method) if mode == "fast" else predictor.detect_trend()
+    return _with_timings(predictor, result)
+
+
+def run_seasonality(data: List[Dict[str, Any]], date_column: str, value_column: str,
+                    options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run seasonal decomposition"""
+    predictor = _create_predictor(options)
+    with predictor.profiler.stage("prepare"):
+        predictor.prepare_data(data, date_column, value_column)
+    with predictor.profiler.stage("seasonality"):
+        result = predictor.seasonal_decomposition()
+    return _with_timings(predictor, result)
+
+
+def run_anomalies(data: List[Dict[str, Any]], date_column: str, value_column: str, source: str = "residual",
+                  window: Optional[int] = None, threshold: float = 3.5, max_anomalies: int = 1000,
+                  options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run rolling robust z-score anomaly detection"""
+    predictor = _create_predictor(options)
+    with predictor.profiler.stage("prepare"):
+        predictor.prepare_data(data, date_column, value_column)
+    with predictor.profiler.stage("anomalies"):
+        result = predictor.detect_anomalies(source, window, threshold, max_anomalies)
+    return _with_timings(predictor, result)
+
+
+def run_forecast(series: "pd.Series", forecast_periods: int = 30, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run a forecast on a single prepared series"""
+    predictor = _create_predictor(options)
+    with predictor.profiler.stage("prepare"):
+        predictor.prepare_series(series)
+    with predictor.profiler.stage("forecast"):
+        result = predictor.forecast(forecast_periods)
+    return _with_timings(predictor, result)
+
+
+def run_hierarchy_plan(data: List[Dict[str, Any]], date_column: str, value_column: str, levels: List[str],
+                       options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Build the node series of a hierarchy and pick their model"""
+    predictor = _create_predictor(options)
+    result = predictor.plan_hierarchy(data, date_column, value_column, levels)
+    return _with_timings(predictor, result)
+
+
+def run_node_forecasts(node_values: "np.ndarray", periods: int, model: str, season_length: int) -> Dict[str, Any]:
+    """Forecast a batch of hierarchy node series"""
+    from ml.hierarchy import forecast_nodes
+    return forecast_nodes(node_values, periods, model, season_length)
+
+
+def run_hierarchy_reconcile(plan: Dict[str, Any], base: Dict[str, Any], forecast_periods: int = 30,
+                            reconciliation: str = "mint", options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Reconcile the node forecasts of a hierarchy"""
+    predictor = _create_predictor(options)
+    result = predictor.reconcile_hierarchy(plan, base, forecast_periods, reconciliation)
+    return _with_timings(predictor, result)
+
+
+def run_backtest_folds(values: "np.ndarray", origins: List[int], horizon: int,
+                       order: Tuple[int, int, int]) -> List[Dict[str, Any]]:
+    """Run a batch of a rolling-origin backtest's folds"""
+    from ml.backtest import run_folds
+    return run_folds(values, origins, horizon, order)
+
+
+class PredictorExecutor:
+    """Runs predictor jobs off the event loop with bounded workers and timeouts"""
+
+    def __init__(self, mode: Optional[str] = None, max_workers: Optional[int] = None, timeout: Optional[float] = None):
+        mode = (mode or os.getenv("PREDICTOR_EXECUTION_MODE", "process")).lower()
+        if mode not in EXECUTION_MODES:
+            logger.warning(f"Unknown predictor execution mode '{mode}', falling back to 'process'")
+            mode = "process"
+
+        self.mode = mode
+        self.max_workers = max_workers or int(os.getenv("PREDICTOR_WORKERS", "0")) or os.cpu_count() or 1
+        self.timeout = timeout if timeout is not None else float(os.getenv("PREDICTOR_JOB_TIMEOUT", "120"))
+        self.start_method = os.getenv("PREDICTOR_START_METHOD", DEFAULT_START_METHOD)
+        self._pool = None
+        self._semaphore = None
+        self._active_jobs = 0
+
+    def _get_pool(self):
+        """Create the worker pool on first use"""
+        if self._pool is None:
+            if self.mode == "process":
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context(self.start_method)
+                )
+            elif self.mode == "thread":
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="predictor")
+            logger.info(f"Predictor executor started in {self.mode} mode with {self.max_workers} workers")
+        return self._pool
+
+    def _discard_pool(self, pool):
+        """Drop a pool that a dead worker has broken; the next job starts a new one"""
+        if self._pool is pool:
+            self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            logger.warning("Predictor worker pool broken (a worker died), starting a new one")
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """Run a job and wait for its result.
+
+        Jobs wait for a free worker before being submitted, so the timeout only
+        covers execution. Raises PredictionTimeoutError when the job exceeds it.
+        A job that has started cannot be interrupted: when it times out, or the
+        awaiting request is cancelled, it keeps its worker slot until it
+        actually finishes, so later jobs are not queued behind it unawares.
+        When a worker process dies the pool is broken for good, so it is
+        replaced and later jobs run on a new one.
+        """
+        if self.mode == "inline":
+            return fn(*args)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        semaphore = self._semaphore
+
+        await semaphore.acquire()
+        loop = asyncio.get_running_loop()
+        job_timeout = timeout if timeout is not None else self.timeout
+        pool = job = None
+
+        self._active_jobs += 1
+        try:
+            pool = self._get_pool()
+            try:
+                job = pool.submit(fn, *args)
+            except BrokenExecutor:
+                # Broke while idle: the job never reached it, so retry once on a new pool
+                self._discard_pool(pool)
+                pool = self._get_pool()
+                job = pool.submit(fn, *args)
+            future = asyncio.wrap_future(job)
+            # Shielded: giving up on the result must not mark the job as done
+            return await asyncio.wait_for(asyncio.shield(future), timeout=job_timeout or None)
+        except asyncio.TimeoutError:
+            logger.warning(f"Predictor job {getattr(fn, '__name__', fn)} timed out after {job_timeout}s")
+            raise PredictionTimeoutError(f"Prediction job exceeded {job_timeout}s timeout")
+        except BrokenExecutor:
+            # This job's worker (or another one of the pool) died while it ran
+            self._discard_pool(pool)
+            raise
+        finally:
+            self._active_jobs -= 1
+            if job is None or job.done() or job.cancel():
+                semaphore.release()
+            else:
+                # Still running: free the slot when the worker does
+                future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                job.add_done_callback(lambda _: loop.is_closed() or loop.call_soon_threadsafe(semaphore.release))
+
+    async def map(self, fn: Callable[..., Any], arg_tuples: Iterable[Tuple], timeout: Optional[float] = None) -> List[Any]:
+        """Run fn over several argument tuples as concurrent jobs, returning the results in order.
+
+        This is how one request spreads its work over the pool; like run, it is
+        called from the event loop, never from inside a job. When a job fails,
+        the jobs still waiting for a worker are dropped and the error is raised.
+        """
+        tasks = [asyncio.ensure_future(self.run(fn, *args, timeout=timeout)) for args in arg_tuples]
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def shutdown(self):
+        """Stop the worker pool and cancel queued jobs"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._semaphore = None
+            logger.info("Predictor executor stopped")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get executor statistics"""
+        return {
+            "mode": self.mode,
+            "workers": self.max_workers,
+            "timeout": self.timeout,
+            "startMethod": self.start_method if self.mode == "process" else None,
+            "activeJobs": self._active_jobs,
+            "started": self._pool is not None
+        }
+
+
+# Global executor instance
+predictor_executor = PredictorExecutor()
+
+
+# Drivers: requests whose work splits into independent parts run as several
+# jobs on the shared executor instead of in one worker (a worker must not
+# start a pool of its own)
+
+async def forecast_hierarchy(data: List[Dict[str, Any]], date_column: str, value_column: str, levels: List[str],
+                             forecast_periods: int = 30, reconciliation: str = "mint",
+                             options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run a reconciled forecast over a hierarchy of dimensions.
+
+    The node series are built in one job, forecast in row batches as
+    concurrent jobs and reconciled in a final one, so large hierarchies use
+    every worker and no single job runs for the whole forecast.
+    """
+    from ml.hierarchy import combine_node_forecasts, node_batches
+
+    profiler = StageProfiler()
+    with profiler.stage("plan"):
+        plan = await predictor_executor.run(run_hierarchy_plan, data, date_column, value_column, levels, options)
+    profiler.include(plan.pop("timings", None), "plan")
+    if not plan.get("success"):
+        return plan
+
+    node_values = plan.pop("nodeValues")
+    with profiler.stage("node_forecasts"):
+        parts = await predictor_executor.map(run_node_forecasts, [
+            (node_values[rows], forecast_periods, plan["model"], plan["seasonLength"])
+            for rows in node_batches(len(node_values), plan["model"], predictor_executor.max_workers)
+        ])
+    del node_values
+
+    with profiler.stage("reconcile"):
+        result = await predictor_executor.run(
+            run_hierarchy_reconcile, plan, combine_node_forecasts(parts), forecast_periods, reconciliation, options
+        )
+    profiler.include(result.pop("timings", None), "reconcile")
+    return {**result, "timings": profiler.report()}
+
+
+async def search_arima_order(values: "np.ndarray", time_budget: float = 5.0, max_p: int = 3, max_q: int = 3,
+                             max_d: int = 2) -> Dict[str, Any]:
+    """Stepwise ARIMA order search with each round's candidates fitted as concurrent jobs.
+
+    The budget bounds the search's wall time, waiting for workers and the
+    differencing tests included: fits unfinished at the deadline are given up
+    on (their workers stay busy until they end) and the best order so far is
+    kept, or the default one with a warning when nothing was fitted in time.
+    """
+    from ml.order_search import StepwiseSearch, select_arima_order
+
+    if predictor_executor.mode == "inline":
+        # Jobs run to completion as they are started, so a round could not be cut short
+        return select_arima_order(values, max_p, max_q, max_d, time_budget)
+
+    search = StepwiseSearch(time_budget, max_p, max_q)
+    try:
+        d = await asyncio.wait_for(predictor_executor.run(run_differencing, values, max_d), max(search.remaining(), 0))
+    except (asyncio.TimeoutError, PredictionTimeoutError):
+        search.cut_short = True
+        d = 1
+    search.start(d)
+
+    while True:
+        candidates = search.next_round()
+        if not candidates:
+            break
+        fits = await asyncio.gather(*(
+            asyncio.wait_for(predictor_executor.run(run_order_candidate, values, order), max(search.remaining(), 0))
+            for order in candidates
+        ), return_exceptions=True)
+        for fit in fits:
+            if isinstance(fit, (asyncio.TimeoutError, PredictionTimeoutError)):
+                search.cut_short = True
+            elif isinstance(fit, BaseException):
+                raise fit
+            else:
+                search.record(*fit)
+        if search.cut_short:
+            break
+
+    return search.result()
+
+
+async def backtest(data: List[Dict[str, Any]], date_column: str, value_column: str, horizon: int = 7, folds: int = 5,
+                   step: Optional[int] = None, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run a rolling-origin backtest with its folds in batches as concurrent jobs.
+
+    The series is prepared in one job; with order search on, the order is
+    searched (as search_arima_order) on the data before the first fold so
+    it does not see the test points.
+    """
+    from ml.backtest import fold_batches, fold_origins, insufficient_data_error, summarize_folds
+
+    options = options or {}
+    profiler = StageProfiler()
+    with profiler.stage("prepare"):
+        prepared = await predictor_executor.run(run_prepare, data, date_column, value_column, options)
+    profiler.include(prepared.pop("timings", None), "prepare")
+    if not prepared.get("success"):
+        return prepared
+
+    values = prepared["series"].to_numpy(dtype=float)
+    step = step or horizon
+    origins = fold_origins(len(values), horizon, folds, step)
+    if not origins:
+        return {"success": False, "error": insufficient_data_error(horizon), "timings": profiler.report()}
+
+    order = (1, 1, 1)
+    if options.get("order_search"):
+        first_origin = len(values) - horizon - step * (folds - 1)
+        if first_origin >= 20:
+            with profiler.stage("order_search"):
+                selection = await search_arima_order(values[:first_origin], options.get("search_budget", 5.0))
+            order = tuple(selection["order"])
+
+    with profiler.stage("folds"):
+        parts = await predictor_executor.map(run_backtest_folds, [
+            (values, batch, horizon, order) for batch in fold_batches(origins, predictor_executor.max_workers)
+        ])
+
+    with profiler.stage("score"):
+        result = summarize_folds([fold for part in parts for fold in part], horizon, step, order)
+    return {**result, "timings": profiler.report()}
@@ -0,0 +1,106 @@
+import numpy as np
+from typing import Dict, Any, Optional, Tuple
+
+# Two-sided 95% normal quantile used for prediction intervals
+Z_95 = 1.96
+
+# Models from cheapest to most expensive
+MODEL_TIERS = ("seasonal_naive", "linear", "ses", "holt_winters", "arima")
+
+
+def select_model(n: int, season_length: int = 1, latency_budget: Optional[float] = None) -> Tuple[str, str]:
+    """Pick a model tier from the series length and latency budget (seconds).
+
+    Returns the model name and the reason it was chosen.
+    """
+    seasonal = season_length > 1 and n >= 2 * season_length
+
+    if n < 20:
+        return ("seasonal_naive" if seasonal else "linear"), "series too short for ARIMA"
+    if (latency_budget is not None and latency_budget < 0.05) or n > 20_000:
+        return ("seasonal_naive" if seasonal else "ses"), "tight latency budget or long series"
+    if latency_budget is not None and latency_budget < 0.5:
+        # Holt-Winters optimizes in Python, so keep it to moderate lengths
+        return ("holt_winters" if seasonal and n <= 5_000 else "ses"), "moderate latency budget"
+    return "arima", "series length and budget allow ARIMA"
+
+
+def seasonal_naive(values: np.ndarray, periods: int, season_length: int = 1) -> Dict[str, Any]:
+    """Repeat the last observed season (plain naive forecast when season_length is 1)"""
+    n = len(values)
+    m = max(1, min(season_length, n - 1))
+    steps = np.arange(periods)
+
+    predicted = values[n - m + (steps % m)]
+    residuals = values[m:] - values[:-m]
+    sigma = float(np.std(residuals)) if len(residuals) > 1 else 0.0
+    width = Z_95 * sigma * np.sqrt(steps // m + 1)
+
+    return {"predicted": predicted, "lower": predicted - width, "upper": predicted + width, "params": {"seasonLength": m}}
+
+
+def linear_trend(values: np.ndarray, periods: int) -> Dict[str, Any]:
+    """Extrapolate a least-squares line"""
+    n = len(values)
+    x = np.arange(n, dtype=float)
+    x_mean = x.mean()
+    ss_x = float(np.dot(x - x_mean, x - x_mean))
+    slope = float(np.dot(x - x_mean, values - values.mean())) / ss_x if ss_x > 0 else 0.0
+    intercept = float(values.mean()) - slope * x_mean
+
+    residuals = values - (intercept + slope * x)
+    sigma = float(np.sqrt(np.dot(residuals, residuals) / max(1, n - 2)))
+
+    future_x = np.arange(n, n + periods, dtype=float)
+    predicted = intercept + slope * future_x
+    width = Z_95 * sigma * np.sqrt(1 + 1 / n + (future_x - x_mean) ** 2 / (ss_x or 1))
+
+    return {"predicted": predicted, "lower": predicted - width, "upper": predicted + width,
+            "params": {"slope": slope, "intercept": intercept}}
+
+
+def simple_exponential_smoothing(values: np.ndarray, periods: int) -> Dict[str, Any]:
+    """Simple exponential smoothing with the smoothing level chosen on a grid.
+
+    Each candidate level is a single linear filter pass, so fitting stays O(n).
+    """
+    from scipy.signal import lfilter
+    
+    best = None
+    for alpha in np.linspace(0.05, 0.95, 19):
+        # level[t] = alpha * y[t] + (1 - alpha) * level[t - 1], starting from y[0]
+        level, _ = lfilter([alpha], [1, alpha - 1], values, zi=[(1 - alpha) * values[0]])
+        errors = values[1:] - level[:-1]
+        sse = float(np.dot(errors, errors))
+        if best is None or sse < best[0]:
+            best = (sse, alpha, float(level[-1]))
+
+    sse, alpha, last_level = best
+    sigma = np.sqrt(sse / max(1, len(values) - 1))
+    steps = np.arange(periods)
+    predicted = np.full(periods, last_level)
+    width = Z_95 * sigma * np.sqrt(1 + steps * alpha ** 2)
+
+    return {"predicted": predicted, "lower": predicted - width, "upper": predicted + width,
+            "params": {"alpha": round(float(alpha), 2)}}
+
+
+def holt_winters(values: np.ndarray, periods: int, season_length: int = 1) -> Dict[str, Any]:
+    """Additive Holt-Winters (additive trend, plus additive seasonality when the series allows)"""
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+    seasonal = season_length > 1 and len(values) >= 2 * season_length
+    fitted = ExponentialSmoothing(
+        values,
+        trend="add",
+        seasonal="add" if seasonal else None,
+        seasonal_periods=season_length if seasonal else None,
+        initialization_method="estimated"
+    ).fit()
+
+    predicted = np.asarray(fitted.forecast(periods))
+    sigma = float(np.std(fitted.resid))
+    width = Z_95 * sigma * np.sqrt(np.arange(1, periods + 1))
+
+    return {"predicted": predicted, "lower": predicted - width, "upper": predicted + width,
+            "params": {"seasonLength": season_length if seasonal else None, "aic": float(fitted.aic)}}
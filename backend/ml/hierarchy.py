@@ -0,0 +1,146 @@
+import warnings
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+from ml import forecasters
+
+RECONCILIATION_METHODS = ("mint", "ols", "bottom_up")
+
+# Models slow enough per node to be worth spreading over several worker jobs
+PARALLEL_MODELS = ("holt_winters", "arima")
+
+def build_summing_matrix(leaves: pd.MultiIndex) -> Tuple[sparse.csr_matrix, List[Dict[str, Any]]]:
+    """Build the summing matrix S of a tree over the levels of a leaf index.
+
+    Rows are nodes ordered by depth (the total, then every prefix of the
+    levels, leaves last), so S stacks the aggregation matrix C on the identity.
+    Returns S and a description of every node.
+    """
+    levels = list(leaves.names)
+    m = len(leaves)
+    rows, nodes = [], []
+
+    for depth in range(len(levels) + 1):
+        if depth == 0:
+            codes, uniques = np.zeros(m, dtype=int), [()]
+        else:
+            prefix = pd.MultiIndex.from_arrays([leaves.get_level_values(i) for i in range(depth)])
+            codes, uniques = pd.factorize(prefix)
+        rows.append(codes + len(nodes))
+        for labels in uniques:
+            labels = tuple(labels)
+            nodes.append({
+                "key": "/".join(map(str, labels)) or "total",
+                "level": levels[depth - 1] if depth else "total",
+                "depth": depth,
+                "labels": dict(zip(levels, map(str, labels)))
+            })
+
+    row_index = np.concatenate(rows)
+    col_index = np.tile(np.arange(m), len(levels) + 1)
+    summing = sparse.csr_matrix((np.ones(len(row_index)), (row_index, col_index)), shape=(len(nodes), m))
+    return summing, nodes
+
+
+def reconcile(summing: sparse.csr_matrix, base: np.ndarray, method: str = "mint",
+              variances: Optional[np.ndarray] = None) -> np.ndarray:
+    """Make base forecasts (nodes x horizon, ordered as the rows of S) coherent.
+
+    "bottom_up" sums the leaf forecasts. "ols" and "mint" are the trace
+    minimization projection with W = I and W = diag(one-step forecast error
+    variances) respectively. Instead of inverting S'W^-1 S (leaves x leaves,
+    dense because every leaf shares the total), the projection is solved in the
+    aggregate-node space, where W_a + C W_b C' is sparse for a tree:
+
+        b~ = b^ + W_b C' (W_a + C W_b C')^-1 (a^ - C b^)
+    """
+    n, m = summing.shape
+    n_aggregate = n - m
+    bottom = base[n_aggregate:]
+
+    if method == "bottom_up" or n_aggregate == 0:
+        return summing @ bottom
+
+    if method == "ols":
+        weights = np.ones(n)
+    else:
+        weights = np.asarray(variances, dtype=float)
+        # Perfectly fitted nodes (e.g. all zeros) would otherwise get infinite weight
+        positive = weights[weights > 0]
+        weights = np.maximum(weights, positive.min() * 1e-3 if len(positive) else 1.0)
+
+    aggregation = summing[:n_aggregate]
+    bottom_weights = sparse.diags(weights[n_aggregate:])
+    system = sparse.diags(weights[:n_aggregate]) + aggregation @ bottom_weights @ aggregation.T
+    incoherence = base[:n_aggregate] - aggregation @ bottom
+    correction = splu(sparse.csc_matrix(system)).solve(np.ascontiguousarray(incoherence))
+
+    return summing @ (bottom + bottom_weights @ (aggregation.T @ correction))
+
+
+def _forecast_node(values: np.ndarray, periods: int, model: str, season_length: int) -> Dict[str, Any]:
+    """Forecast one node series with one model"""
+    try:
+        if model == "arima":
+            from statsmodels.tsa.arima.model import ARIMA
+            fitted = ARIMA(values, order=(1, 1, 1)).fit()
+            forecast = fitted.get_forecast(steps=periods)
+            intervals = np.asarray(forecast.conf_int())
+            fit = {"predicted": np.asarray(forecast.predicted_mean), "lower": intervals[:, 0], "upper": intervals[:, 1]}
+        elif model == "holt_winters":
+            fit = forecasters.holt_winters(values, periods, season_length)
+        elif model == "ses":
+            fit = forecasters.simple_exponential_smoothing(values, periods)
+        elif model == "linear":
+            fit = forecasters.linear_trend(values, periods)
+        else:
+            fit = forecasters.seasonal_naive(values, periods, season_length)
+        used = model
+    except Exception:
+        # A node the model cannot fit (e.g. constant series) falls back to the cheapest tier
+        fit = forecasters.seasonal_naive(values, periods, season_length)
+        used = "seasonal_naive"
+    return {"model": used, **{key: fit[key] for key in ("predicted", "lower", "upper")}}
+
+
+def forecast_nodes(node_values: np.ndarray, periods: int, model: str, season_length: int = 1) -> Dict[str, Any]:
+    """Forecast every node series (rows of node_values).
+
+    Nodes are forecast one after another in the calling process; to spread a
+    large hierarchy over the worker pool, forecast row batches (node_batches)
+    as separate jobs and combine them with combine_node_forecasts.
+    """
+    node_values = np.asarray(node_values, dtype=float)
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore')
+        results = [_forecast_node(values, periods, model, season_length) for values in node_values]
+
+    return {
+        "predicted": np.vstack([result["predicted"] for result in results]),
+        "lower": np.vstack([result["lower"] for result in results]),
+        "upper": np.vstack([result["upper"] for result in results]),
+        "models": [result["model"] for result in results]
+    }
+
+
+def node_batches(n: int, model: str, workers: int) -> List[slice]:
+    """Split n node rows into batches to forecast as separate jobs.
+
+    Slow models get several batches per worker, so uneven fit times even out;
+    the cheap tiers are vectorized enough that one batch beats the job overhead.
+    """
+    parts = min(n, workers * 4) if model in PARALLEL_MODELS else 1
+    bounds = np.linspace(0, n, max(parts, 1) + 1).astype(int)
+    return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def combine_node_forecasts(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Stack the forecast_nodes results of consecutive row batches"""
+    return {
+        **{key: np.vstack([part[key] for part in parts]) for key in ("predicted", "lower", "upper")},
+        "models": [name for part in parts for name in part["models"]]
+    }
@@ -0,0 +1,169 @@
+import logging
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from statsmodels.tsa.arima.model import ARIMA
+from statsmodels.tsa.stattools import adfuller
+
+logger = logging.getLogger(__name__)
+
+Order = Tuple[int, int, int]
+
+# The ADF tests look at the most recent points only, with a capped lag search:
+# autolag fits one regression per lag, which on a long series can take longer
+# than the whole search budget
+ADF_MAX_POINTS = 5000
+ADF_MAX_LAGS = 12
+
+
+def fit_candidate(values: np.ndarray, order: Order) -> Tuple[Order, float, float]:
+    """Fit one candidate order, returning it with its AIC (inf when the fit fails) and the fit's seconds"""
+    import warnings
+    warnings.filterwarnings('ignore')
+    started = time.perf_counter()
+    try:
+        fitted = ARIMA(values, order=order).fit(method_kwargs={"maxiter": 50})
+        aic = float(fitted.aic)
+        aic = aic if np.isfinite(aic) else float("inf")
+    except Exception:
+        aic = float("inf")
+    return order, aic, time.perf_counter() - started
+
+
+def select_differencing(values: np.ndarray, max_d: int = 2, alpha: float = 0.05) -> int:
+    """Pick the differencing order with repeated ADF stationarity tests"""
+    import warnings
+    series = np.asarray(values, dtype=float)[-ADF_MAX_POINTS:]
+    for d in range(max_d + 1):
+        if len(series) < 10:
+            return d
+        try:
+            # statsmodels' default lag bound, capped
+            max_lags = min(ADF_MAX_LAGS, int(np.ceil(12 * (len(series) / 100) ** 0.25)))
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                p_value = adfuller(series, maxlag=max_lags, autolag="AIC")[1]
+            if p_value < alpha:
+                return d
+        except Exception:
+            return d
+        series = np.diff(series)
+    return max_d
+
+
+def _neighbours(order: Order, max_p: int, max_q: int) -> List[Order]:
+    """Orders one step away from the current best (stepwise search)"""
+    p, d, q = order
+    candidates = [
+        (p + 1, d, q), (p - 1, d, q), (p, d, q + 1), (p, d, q - 1),
+        (p + 1, d, q + 1), (p - 1, d, q - 1)
+    ]
+    return [(cp, d, cq) for cp, _, cq in candidates if 0 <= cp <= max_p and 0 <= cq <= max_q]
+
+
+class StepwiseSearch:
+    """State of a stepwise ARIMA order search under a wall-clock budget.
+
+    Each round holds the unexplored neighbours of the best order found so far,
+    so candidates far from the AIC optimum are never fitted; the search ends
+    when a round brings no improvement. The budget clock starts when the
+    search does (before the differencing tests), and a round or candidate is
+    only started while the remaining budget exceeds the slowest fit seen so
+    far. Shared by select_arima_order, which fits candidates one after
+    another, and ml.executor.search_arima_order, which fits each round as
+    concurrent jobs.
+    """
+
+    def __init__(self, time_budget: float, max_p: int = 3, max_q: int = 3, started: Optional[float] = None):
+        self.time_budget = time_budget
+        self.max_p = max_p
+        self.max_q = max_q
+        self.started = started if started is not None else time.perf_counter()
+        self.deadline = self.started + time_budget
+        self.evaluated: Dict[Order, float] = {}
+        self.best_order: Optional[Order] = None
+        self.best_aic = float("inf")
+        self.slowest_fit = 0.0
+        self.cut_short = False
+        self._improved = True
+        self._pending: List[Order] = []
+
+    def start(self, d: int):
+        """Set the differencing order and the first round of candidates"""
+        self.best_order = (1, d, 1)
+        self._pending = [order for order in [(1, d, 1), (0, d, 0), (1, d, 0), (0, d, 1), (2, d, 2)]
+                         if order[0] <= self.max_p and order[2] <= self.max_q]
+
+    def remaining(self) -> float:
+        return self.deadline - time.perf_counter()
+
+    def has_time(self) -> bool:
+        """Whether another fit is likely to finish within the budget"""
+        if self.remaining() > self.slowest_fit:
+            return True
+        self.cut_short = True
+        return False
+
+    def next_round(self) -> List[Order]:
+        """Candidates to fit next (none once the search has converged or run out of time)"""
+        if not self._pending and self._improved and self.evaluated:
+            self._pending = [order for order in _neighbours(self.best_order, self.max_p, self.max_q)
+                             if order not in self.evaluated]
+        self._improved = False
+        pending, self._pending = self._pending, []
+        return pending if pending and self.has_time() else []
+
+    def record(self, order: Order, aic: float, seconds: float):
+        """Record a fitted candidate"""
+        self.evaluated[order] = aic
+        self.slowest_fit = max(self.slowest_fit, seconds)
+        if aic < self.best_aic:
+            self.best_order, self.best_aic = order, aic
+            self._improved = True
+
+    def result(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        if self.cut_short:
+            logger.info(f"ARIMA order search stopped by its {self.time_budget}s budget after {len(self.evaluated)} candidates")
+
+        candidates = sum(1 for aic in self.evaluated.values() if np.isfinite(aic))
+        selection = {
+            "method": "auto",
+            "order": self.best_order,
+            "aic": self.best_aic if np.isfinite(self.best_aic) else None,
+            "searched": candidates > 0,
+            "candidatesEvaluated": candidates,
+            "elapsed": round(elapsed, 3),
+            "budgetExceeded": elapsed > self.time_budget,
+            "converged": not self.cut_short
+        }
+        if not candidates:
+            selection["warning"] = f"No candidate order could be fitted within the budget; using the default {self.best_order}"
+        return selection
+
+
+def select_arima_order(values: np.ndarray, max_p: int = 3, max_q: int = 3, max_d: int = 2,
+                       time_budget: float = 5.0) -> Dict[str, Any]:
+    """Stepwise ARIMA order search within a time budget, fitting candidates in this process.
+
+    A fit in progress cannot be interrupted here, so until one fit has been
+    timed the budget can be overshot by that fit. Requests fan the search out
+    over the worker pool with ml.executor.search_arima_order instead.
+    """
+    values = np.asarray(values, dtype=float)
+    search = StepwiseSearch(time_budget, max_p, max_q)
+    search.start(select_differencing(values, max_d))
+
+    while True:
+        candidates = search.next_round()
+        if not candidates:
+            break
+        for order in candidates:
+            if not search.has_time():
+                break
+            search.record(*fit_candidate(values, order))
+        if search.cut_short:
+            break
+
+    return search.result()
@@ -1,46 +1,267 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple, Union
+import hashlib
+import time
 from statsmodels.tsa.seasonal import seasonal_decompose
 from statsmodels.tsa.arima.model import ARIMA
+from ml.order_search import select_arima_order
+from ml.encoding import encode_columns
+from ml.anomaly import rolling_robust_zscore
+from ml.columnar import ColumnarDataset, parse_dates
+from ml.backtest import rolling_origin_backtest
+from ml.profiling import StageProfiler
+from ml import forecasters
+from ml import hierarchy
 import warnings
 warnings.filterwarnings('ignore')
 
 class TimeSeriesPredictor:
     """Time series prediction and analysis"""
     
-    def __init__(self):
+    # Appended-data updates reuse stored parameters; after this many in a row
+    # (or when more than half the series is new) the parameters are re-estimated
+    MAX_STATE_UPDATES = 10
+    
+    # Aggregations allowed when resampling
+    RESAMPLE_AGGREGATIONS = ("sum", "mean", "last")
+    
+    # Series scored by anomaly detection
+    ANOMALY_SOURCES = ("residual", "raw")
+    
+    def __init__(self, order_search: bool = False, search_budget: float = 5.0, order_selection: Optional[Dict[str, Any]] = None,
+                 warm_start: Optional[Dict[str, Any]] = None,
+                 resample_freq: Optional[str] = None, resample_agg: str = "sum", max_points: Optional[int] = None,
+                 output_format: str = "records", float_precision: Optional[int] = None, max_output_points: Optional[int] = None,
+                 model_type: str = "arima", latency_budget: Optional[float] = None, profile_memory: bool = False,
+                 date_format: Optional[str] = None):
+        self.order_search = order_search
+        self.search_budget = search_budget
+        # Result of an order search run beforehand (see ml.executor.search_arima_order), used instead of searching
+        self.order_selection = order_selection
+        self.warm_start = warm_start
+        self.resample_freq = resample_freq
+        self.resample_agg = resample_agg
+        self.max_points = max_points
+        # "compact" returns columnar arrays with start/step dates instead of per-point values
+        self.output_format = output_format
+        self.float_precision = float_precision
+        self.max_output_points = max_output_points
+        # "auto" picks a model tier from series length and latency budget (seconds)
+        self.model_type = model_type
+        self.latency_budget = latency_budget
+        # Format inferred for the date column at upload, so rows parse without per-value guessing
+        self.date_format = date_format
+        # Per-stage wall/CPU time, plus allocated memory when profile_memory is set
+        self.profiler = StageProfiler(track_memory=profile_memory)
         self.model = None
         self.data = None
         self.date_column = None
         self.value_column = None
+        self._cache: Dict[str, Any] = {}
     
-    def prepare_data(self, data: List[Dict[str, Any]], date_column: str, value_column: str) -> pd.DataFrame:
-        """Prepare data for time series analysis"""
-        df = pd.DataFrame(data)
+    def prepare_data(self, data: Union[List[Dict[str, Any]], ColumnarDataset, pd.Series], date_column: str,
+                     value_column: str) -> pd.DataFrame:
+        """Prepare data for time series analysis (a series prepared by an earlier job is taken as is)"""
+        if isinstance(data, pd.Series):
+            return self.prepare_series(data)
+        if isinstance(data, ColumnarDataset):
+            return self._prepare_columnar(data, date_column, value_column)
+        
+        with self.profiler.stage("dataframe"):
+            df = pd.DataFrame(data)
+        
+        with self.profiler.stage("parse_dates"):
+            # Convert date column to datetime
+            df[date_column] = parse_dates(df[date_column], self.date_format)
+            
+            # Sort by date
+            df = df.sort_values(date_column)
+            
+            # Set date as index
+            df.set_index(date_column, inplace=True)
+        
+        with self.profiler.stage("clean_values"):
+            # Ensure value column is numeric
+            df[value_column] = pd.to_numeric(df[value_column], errors='coerce')
+            
+            # Remove NaN values
+            df = df.dropna(subset=[value_column])
+        
+        # Aggregate to the target frequency and bound the number of points
+        if self.resample_freq or self.max_points:
+            with self.profiler.stage("resample"):
+                df = self._resample(df[value_column]).to_frame(value_column)
+        
+        self.data = df
+        self.date_column = date_column
+        self.value_column = value_column
         
-        # Convert date column to datetime
-        df[date_column] = pd.to_datetime(df[date_column])
+        # Derived results belong to the previous series
+        self._cache = {}
         
-        # Sort by date
-        df = df.sort_values(date_column)
+        return df
+    
+    def _prepare_columnar(self, data: ColumnarDataset, date_column: str, value_column: str) -> pd.DataFrame:
+        """Prepare a stored columnar dataset: typed, date-sorted and memory-mapped, so nothing is parsed"""
+        if data.date_column != date_column or not data.has_columns(value_column):
+            raise ValueError(f"Columns '{date_column}' and '{value_column}' are not stored in columnar form")
         
-        # Set date as index
-        df.set_index(date_column, inplace=True)
+        with self.profiler.stage("load_columns"):
+            index = data.date_index(date_column)
+            values = data.column(value_column)
         
-        # Ensure value column is numeric
-        df[value_column] = pd.to_numeric(df[value_column], errors='coerce')
+        with self.profiler.stage("clean_values"):
+            # Only copy when there is something to drop
+            missing = np.isnan(values)
+            if missing.any():
+                index, values = index[~missing], values[~missing]
+            df = pd.DataFrame({value_column: values}, index=index, copy=False)
         
-        # Remove NaN values
-        df = df.dropna(subset=[value_column])
+        if self.resample_freq or self.max_points:
+            with self.profiler.stage("resample"):
+                df = self._resample(df[value_column]).to_frame(value_column)
         
         self.data = df
         self.date_column = date_column
         self.value_column = value_column
+        self._cache = {}
+        
+        return df
+    
+    def prepare_series(self, series: pd.Series) -> pd.DataFrame:
+        """Prepare an already indexed, numeric series (e.g. one series of a batch)"""
+        value_column = str(series.name) if series.name is not None else "value"
+        df = self._resample(series.dropna()).to_frame(value_column)
+        
+        self.data = df
+        self.date_column = df.index.name
+        self.value_column = value_column
+        self._cache = {}
         
         return df
     
+    @classmethod
+    def validate_resampling(cls, resample_freq: Optional[str], resample_agg: str) -> Optional[str]:
+        """Validate resampling options, returning an error message if invalid"""
+        if resample_agg not in cls.RESAMPLE_AGGREGATIONS:
+            return f"Unsupported resample aggregation '{resample_agg}' (use {', '.join(cls.RESAMPLE_AGGREGATIONS)})"
+        if resample_freq:
+            try:
+                pd.tseries.frequencies.to_offset(resample_freq)
+            except ValueError:
+                return f"Invalid resample frequency '{resample_freq}'"
+        return None
+    
+    def _resample(self, series: pd.Series) -> pd.Series:
+        """Aggregate a date-indexed series to the target frequency and cap its length"""
+        if self.resample_freq:
+            if self.resample_agg not in self.RESAMPLE_AGGREGATIONS:
+                raise ValueError(f"Unsupported resample aggregation '{self.resample_agg}'")
+            
+            resampler = series.resample(self.resample_freq)
+            if self.resample_agg == "sum":
+                # min_count keeps empty buckets as gaps instead of zeros
+                series = resampler.sum(min_count=1)
+            elif self.resample_agg == "mean":
+                series = resampler.mean()
+            else:
+                series = resampler.last()
+            series = series.dropna()
+        
+        # Keep the most recent points so fit time stays bounded
+        if self.max_points and len(series) > self.max_points:
+            series = series.iloc[-self.max_points:]
+        
+        return series
+    
+    def _get_forecast_offset(self) -> pd.DateOffset:
+        """Get the spacing of forecast dates from the prepared series"""
+        if self.resample_freq:
+            return pd.tseries.frequencies.to_offset(self.resample_freq)
+        
+        inferred = pd.infer_freq(self.data.index) if len(self.data) >= 3 else None
+        return pd.tseries.frequencies.to_offset(inferred or 'D')
+    
+    def _get_series(self) -> pd.Series:
+        """Get the prepared value series"""
+        if "series" not in self._cache:
+            self._cache["series"] = self.data[self.value_column]
+        return self._cache["series"]
+    
+    def _get_stats(self) -> Dict[str, float]:
+        """Get summary statistics of the prepared series, computed once"""
+        if "stats" not in self._cache:
+            values = self._get_series().to_numpy(dtype=float)
+            self._cache["stats"] = {
+                "min": float(values.min()),
+                "max": float(values.max()),
+                "mean": float(values.mean()),
+                "std": float(values.std(ddof=1)) if len(values) > 1 else 0.0
+            }
+        return self._cache["stats"]
+    
+    def _get_decomposition(self, period: int):
+        """Get the additive seasonal decomposition for a period, shared across stages"""
+        key = ("decomposition", period)
+        if key not in self._cache:
+            with self.profiler.stage("decomposition"):
+                self._cache[key] = seasonal_decompose(
+                    self._get_series(),
+                    model='additive',
+                    period=period
+                )
+        return self._cache[key]
+    
+    def detect_period(self, max_candidates: int = 5, min_acf: float = 0.2) -> Dict[str, Any]:
+        """Detect the dominant seasonal period of the prepared series.
+        
+        Candidates come from the periodogram peaks plus the natural cycles of the
+        sampling frequency inferred from the index (e.g. 7 for daily data); the
+        candidate with the highest autocorrelation wins. Falls back to the
+        previous fixed default when nothing is clearly periodic.
+        """
+        if "period" in self._cache:
+            return self._cache["period"]
+        
+        n = len(self.data) if self.data is not None else 0
+        fallback = max(2, min(12, n // 2))
+        frequency = _infer_frequency(self.data.index) if n > 1 else None
+        result = {"period": fallback, "method": "default", "frequency": frequency, "acf": None}
+        
+        if n >= 8:
+            with self.profiler.stage("period_detection"):
+                y = self._get_series().to_numpy(dtype=float)
+                x = np.arange(n, dtype=float)
+                
+                # Remove the linear trend so it does not dominate low frequencies
+                slope, intercept = np.polyfit(x, y, 1)
+                detrended = y - (slope * x + intercept)
+                
+                # Periodogram peaks (skip the zero frequency)
+                power = np.abs(np.fft.rfft(detrended)) ** 2
+                freqs = np.fft.rfftfreq(n)
+                top = np.argsort(power[1:])[::-1][:max_candidates] + 1
+                candidates = {int(round(1 / freqs[i])) for i in top if freqs[i] > 0}
+                candidates.update(SEASONAL_PERIODS.get(frequency, ()))
+                candidates = sorted(p for p in candidates if 2 <= p <= n // 2)
+                
+                if candidates:
+                    acf = _autocorrelation(detrended)
+                    scores = acf[candidates]
+                    best = int(np.argmax(scores))
+                    # Require the autocorrelation to clear the white-noise band too
+                    if scores[best] >= max(min_acf, 2 / np.sqrt(n)):
+                        result = {
+                            "period": candidates[best],
+                            "method": "fft_acf",
+                            "frequency": frequency,
+                            "acf": round(float(scores[best]), 4)
+                        }
+        
+        self._cache["period"] = result
+        return result
+    
     def detect_trend(self) -> Dict[str, Any]:
         """Detect trend in time series data"""
         if self.data is None or len(self.data) < 10:
@@ -53,11 +274,7 @@ class TimeSeriesPredictor:
         
         try:
             # Perform seasonal decomposition
-            decomposition = seasonal_decompose(
-                self.data[self.value_column],
-                model='additive',
-                period=min(12, len(self.data) // 2)
-            )
+            decomposition = self._get_decomposition(self.detect_period()["period"])
             
             trend = decomposition.trend.dropna()
             
@@ -65,9 +282,8 @@ class TimeSeriesPredictor:
             trend_slope = np.polyfit(range(len(trend)), trend.values, 1)[0]
             
             # Normalize slope to get strength (0-100)
-            max_value = self.data[self.value_column].max()
-            min_value = self.data[self.value_column].min()
-            value_range = max_value - min_value
+            stats = self._get_stats()
+            value_range = stats["max"] - stats["min"]
             
             if value_range > 0:
                 strength = min(100, abs(trend_slope / value_range) * 100 * len(trend))
@@ -103,6 +319,81 @@ class TimeSeriesPredictor:
                 "message": f"Error in trend detection: {str(e)}"
             }
     
+    def detect_trend_fast(self, method: str = "ols", max_pairs: int = 200000, seed: int = 0) -> Dict[str, Any]:
+        """Detect trend directly from the raw series with closed-form statistics.
+        
+        Skips seasonal decomposition entirely. "ols" fits a least-squares line,
+        "theilsen" takes the median slope of a random subsample of point pairs,
+        which is robust to outliers.
+        """
+        if self.data is None or len(self.data) < 10:
+            return {
+                "direction": "stable",
+                "strength": 0,
+                "confidence": 0,
+                "message": "Insufficient data for trend analysis"
+            }
+        
+        if method not in ("ols", "theilsen"):
+            return {
+                "direction": "stable",
+                "strength": 0,
+                "confidence": 0,
+                "message": f"Unknown trend method '{method}'"
+            }
+        
+        y = self._get_series().to_numpy(dtype=float)
+        n = len(y)
+        x = np.arange(n, dtype=float)
+        x_mean = (n - 1) / 2.0
+        y_mean = y.mean()
+        x_centered = x - x_mean
+        y_centered = y - y_mean
+        
+        ss_x = float(np.dot(x_centered, x_centered))
+        ss_y = float(np.dot(y_centered, y_centered))
+        ols_slope = float(np.dot(x_centered, y_centered)) / ss_x
+        
+        if method == "theilsen":
+            # Sample index pairs i < j instead of all n^2 / 2 of them
+            rng = np.random.default_rng(seed)
+            pair_count = min(max_pairs, n * (n - 1) // 2)
+            i = rng.integers(0, n, size=pair_count)
+            j = rng.integers(0, n, size=pair_count)
+            valid = i != j
+            i, j = i[valid], j[valid]
+            slope = float(np.median((y[j] - y[i]) / (j - i)))
+            intercept = float(np.median(y - slope * x))
+        else:
+            slope = ols_slope
+            intercept = y_mean - slope * x_mean
+        
+        # R-squared of the fitted line
+        residuals = y - (intercept + slope * x)
+        r_squared = 1 - float(np.dot(residuals, residuals)) / ss_y if ss_y > 0 else 0.0
+        confidence = max(0, min(100, r_squared * 100))
+        
+        stats = self._get_stats()
+        value_range = stats["max"] - stats["min"]
+        strength = min(100, abs(slope / value_range) * 100 * n) if value_range > 0 else 0
+        
+        if abs(slope) < 0.01:
+            direction = "stable"
+        elif slope > 0:
+            direction = "up"
+        else:
+            direction = "down"
+        
+        return {
+            "direction": direction,
+            "strength": round(float(strength), 2),
+            "confidence": round(float(confidence), 2),
+            "slope": slope,
+            "olsSlope": ols_slope,
+            "method": method,
+            "message": f"Trend is {direction} with {confidence:.1f}% confidence"
+        }
+    
     def seasonal_decomposition(self) -> Dict[str, Any]:
         """Perform seasonal decomposition"""
         if self.data is None or len(self.data) < 24:
@@ -112,14 +403,11 @@ class TimeSeriesPredictor:
             }
         
         try:
-            # Determine period (try to detect automatically)
-            period = min(12, len(self.data) // 2)
+            # Determine period from the data's sampling frequency and spectrum
+            period_info = self.detect_period()
+            period = period_info["period"]
             
-            decomposition = seasonal_decompose(
-                self.data[self.value_column],
-                model='additive',
-                period=period
-            )
+            decomposition = self._get_decomposition(period)
             
             # Extract components
             trend = decomposition.trend.dropna()
@@ -127,25 +415,131 @@ class TimeSeriesPredictor:
             residual = decomposition.resid.dropna()
             
             # Calculate seasonality strength
-            seasonal_strength = (seasonal.std() / self.data[self.value_column].std()) * 100
+            seasonal_strength = (seasonal.std() / self._get_stats()["std"]) * 100
             
-            return {
-                "hasSeasonality": seasonal_strength > 10,
+            result = {
+                "hasSeasonality": bool(seasonal_strength > 10),
                 "strength": round(seasonal_strength, 2),
                 "period": period,
-                "trend": trend.tolist(),
-                "seasonal": seasonal.tolist(),
-                "residual": residual.tolist(),
-                "dates": [d.isoformat() for d in trend.index],
-                "message": f"Seasonal pattern detected with {seasonal_strength:.1f}% strength"
+                "periodDetection": period_info
             }
             
+            if self.output_format == "compact":
+                # Components aligned on the full index; undefined edges become null
+                result["components"] = encode_columns(
+                    self.data.index,
+                    {
+                        "trend": decomposition.trend.to_numpy(),
+                        "seasonal": decomposition.seasonal.to_numpy(),
+                        "residual": decomposition.resid.to_numpy()
+                    },
+                    precision=self.float_precision,
+                    max_points=self.max_output_points,
+                    shape_column="trend"
+                )
+            else:
+                result.update({
+                    "trend": trend.tolist(),
+                    "seasonal": seasonal.tolist(),
+                    "residual": residual.tolist(),
+                    "dates": [d.isoformat() for d in trend.index]
+                })
+            
+            result["message"] = f"Seasonal pattern detected with {seasonal_strength:.1f}% strength"
+            return result
+            
         except Exception as e:
             return {
                 "hasSeasonality": False,
                 "message": f"Error in seasonal decomposition: {str(e)}"
             }
     
+    def detect_anomalies(self, source: str = "residual", window: Optional[int] = None, threshold: float = 3.5,
+                         max_anomalies: int = 1000) -> Dict[str, Any]:
+        """Flag outliers with a rolling robust z-score (median/MAD).
+        
+        "residual" scores the seasonal decomposition residuals, so trend and
+        seasonal swings are not flagged; "raw" scores the values directly. The
+        window defaults to two detected periods (at least 25 points). When more
+        than max_anomalies points are flagged, the most extreme are returned.
+        """
+        if source not in self.ANOMALY_SOURCES:
+            return {"success": False, "error": f"Unknown anomaly source '{source}' (use {', '.join(self.ANOMALY_SOURCES)})"}
+        
+        min_points = 24 if source == "residual" else 10
+        if self.data is None or len(self.data) < min_points:
+            return {
+                "success": False,
+                "error": f"Insufficient data for anomaly detection (need at least {min_points} data points)"
+            }
+        
+        try:
+            values = self._get_series().to_numpy(dtype=float)
+            n = len(values)
+            period = self.detect_period()["period"]
+            window = (window or max(25, 2 * period + 1)) | 1
+            
+            # Residuals are undefined for half a period at either end
+            start, stop = 0, n
+            scored = values
+            if source == "residual":
+                residual = self._get_decomposition(period).resid.to_numpy(dtype=float)
+                defined = np.flatnonzero(np.isfinite(residual))
+                start, stop = int(defined[0]), int(defined[-1]) + 1
+                scored = residual[start:stop]
+            
+            with self.profiler.stage("anomaly_scoring"):
+                scores, medians = rolling_robust_zscore(scored, window)
+            
+            zscores = np.full(n, np.nan)
+            zscores[start:stop] = scores
+            expected = values.copy()
+            expected[start:stop] -= scored - medians
+            
+            flagged = np.flatnonzero(np.abs(np.nan_to_num(zscores)) > threshold)
+            total = len(flagged)
+            if total > max_anomalies:
+                extreme = np.argpartition(-np.abs(zscores[flagged]), max_anomalies - 1)[:max_anomalies]
+                flagged = np.sort(flagged[extreme])
+            
+            if self.output_format == "compact":
+                anomalies = encode_columns(
+                    self.data.index[flagged],
+                    {"value": values[flagged], "expected": expected[flagged], "zScore": zscores[flagged]},
+                    precision=self.float_precision
+                )
+            else:
+                anomalies = [
+                    {
+                        "date": self.data.index[i].isoformat(),
+                        "value": float(values[i]),
+                        "expected": float(expected[i]),
+                        "zScore": round(float(zscores[i]), 4),
+                        "direction": "high" if zscores[i] > 0 else "low"
+                    }
+                    for i in flagged
+                ]
+            
+            return {
+                "success": True,
+                "method": "rolling_mad",
+                "source": source,
+                "window": window,
+                "threshold": threshold,
+                "period": period,
+                "totalAnomalies": total,
+                "anomalyRate": round(total / n * 100, 4),
+                "returned": len(flagged),
+                "anomalies": anomalies,
+                "message": f"{total} anomalies detected in {n} data points"
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Error in anomaly detection: {str(e)}"
+            }
+    
     def forecast_arima(self, periods: int = 30) -> Dict[str, Any]:
         """Forecast using ARIMA model"""
         if self.data is None or len(self.data) < 20:
@@ -155,38 +549,40 @@ class TimeSeriesPredictor:
             }
         
         try:
-            # Fit ARIMA model (using auto parameters for simplicity)
-            # In production, use auto_arima from pmdarima
-            model = ARIMA(self.data[self.value_column], order=(1, 1, 1))
-            fitted_model = model.fit()
+            values = self._get_series().to_numpy(dtype=float)
             
-            # Forecast
-            forecast = fitted_model.forecast(steps=periods)
+            # Fit ARIMA model, optionally searching for the best order first;
+            # the fit starts from a previous one of the same order when available
+            order = (1, 1, 1)
+            order_selection = None
+            if self.order_search:
+                order_selection = self.order_selection
+                if order_selection is None:
+                    with self.profiler.stage("order_search"):
+                        order_selection = select_arima_order(values, time_budget=self.search_budget)
+                order = tuple(order_selection["order"])
             
-            # Get confidence intervals
-            forecast_df = fitted_model.get_forecast(steps=periods)
-            confidence_intervals = forecast_df.conf_int()
+            with self.profiler.stage("arima_fit"):
+                fitted_model, fit_mode, updates = self._fit_arima(order, values)
             
-            # Generate future dates
-            last_date = self.data.index[-1]
-            future_dates = pd.date_range(
-                start=last_date + timedelta(days=1),
-                periods=periods,
-                freq='D'
-            )
+            with self.profiler.stage("get_forecast"):
+                # Forecast
+                forecast = fitted_model.forecast(steps=periods)
+                
+                # Get confidence intervals
+                forecast_df = fitted_model.get_forecast(steps=periods)
+                confidence_intervals = forecast_df.conf_int()
             
-            # Prepare forecast data
-            forecast_data = []
-            for i, date in enumerate(future_dates):
-                forecast_data.append({
-                    "date": date.isoformat(),
-                    "predicted": float(forecast.iloc[i]),
-                    "lower": float(confidence_intervals.iloc[i, 0]),
-                    "upper": float(confidence_intervals.iloc[i, 1])
-                })
+            # Generate forecast dates and data
+            forecast_data, offset = self._build_forecast_data(
+                forecast.to_numpy(),
+                confidence_intervals.iloc[:, 0].to_numpy(),
+                confidence_intervals.iloc[:, 1].to_numpy()
+            )
+            last_date = self.data.index[-1]
             
             # Calculate metrics
-            historical_mean = self.data[self.value_column].mean()
+            historical_mean = self._get_stats()["mean"]
             forecast_mean = forecast.mean()
             
             return {
@@ -201,8 +597,20 @@ class TimeSeriesPredictor:
                     "percentChange": float(((forecast_mean - historical_mean) / historical_mean) * 100)
                 },
                 "parameters": {
-                    "order": "(1,1,1)",
+                    "order": "({},{},{})".format(*order),
+                    "frequency": offset.freqstr,
+                    "orderSelection": order_selection or {"method": "fixed"},
+                    "fitMode": fit_mode,
                     "periods": periods
+                },
+                "modelState": {
+                    "order": list(order),
+                    "orderSearch": self.order_search,
+                    "params": [float(value) for value in np.asarray(fitted_model.params)],
+                    "nobs": len(values),
+                    "prefixHash": _hash_values(values),
+                    "lastDate": last_date.isoformat(),
+                    "updatesSinceFit": updates
                 }
             }
             
@@ -212,6 +620,331 @@ class TimeSeriesPredictor:
                 "error": f"Error in ARIMA forecasting: {str(e)}"
             }
     
+    def forecast(self, periods: int = 30) -> Dict[str, Any]:
+        """Forecast with the configured model, or pick a model tier when model_type is "auto".
+        
+        The chosen model and its fit time are reported in the metrics.
+        """
+        requested = self.model_type
+        try:
+            model, reason = self.select_model()
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+        
+        started = time.perf_counter()
+        if model == "arima":
+            result = self.forecast_arima(periods)
+        else:
+            result = self._forecast_light(model, periods)
+        fit_time = time.perf_counter() - started
+        
+        if result.get("success"):
+            result["metrics"]["model"] = model
+            result["metrics"]["fitTime"] = round(fit_time, 4)
+            result["parameters"]["modelSelection"] = {"requested": requested, "selected": model, "reason": reason}
+        return result
+    
+    def select_model(self) -> Tuple[str, str]:
+        """Get the model tier forecast() uses for the prepared series, and why"""
+        # Prophet is not installed; treat it like automatic selection
+        if self.model_type in ("auto", "prophet"):
+            n = len(self.data) if self.data is not None else 0
+            period_info = self.detect_period() if n > 1 else {"method": "default"}
+            season_length = period_info["period"] if period_info["method"] != "default" else 1
+            return forecasters.select_model(n, season_length, self.latency_budget)
+        if self.model_type in forecasters.MODEL_TIERS:
+            return self.model_type, "requested"
+        raise ValueError(f"Unknown model type '{self.model_type}'")
+    
+    def _forecast_light(self, model: str, periods: int) -> Dict[str, Any]:
+        """Forecast with one of the lightweight model tiers"""
+        if self.data is None or len(self.data) < 3:
+            return {
+                "success": False,
+                "error": "Insufficient data for forecasting (need at least 3 data points)"
+            }
+        
+        try:
+            values = self._get_series().to_numpy(dtype=float)
+            period_info = self.detect_period()
+            season_length = period_info["period"] if period_info["method"] != "default" else 1
+            
+            with self.profiler.stage("model_fit"):
+                if model == "seasonal_naive":
+                    fitted = forecasters.seasonal_naive(values, periods, season_length)
+                elif model == "linear":
+                    fitted = forecasters.linear_trend(values, periods)
+                elif model == "ses":
+                    fitted = forecasters.simple_exponential_smoothing(values, periods)
+                else:
+                    fitted = forecasters.holt_winters(values, periods, season_length)
+            
+            forecast_data, offset = self._build_forecast_data(fitted["predicted"], fitted["lower"], fitted["upper"])
+            historical_mean = self._get_stats()["mean"]
+            forecast_mean = float(np.mean(fitted["predicted"]))
+            
+            return {
+                "success": True,
+                "modelType": MODEL_NAMES[model],
+                "forecast": forecast_data,
+                "metrics": {
+                    "historicalMean": float(historical_mean),
+                    "forecastMean": forecast_mean,
+                    "percentChange": float(((forecast_mean - historical_mean) / historical_mean) * 100)
+                },
+                "parameters": {
+                    **fitted["params"],
+                    "frequency": offset.freqstr,
+                    "periods": periods
+                }
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Error in {MODEL_NAMES[model]} forecasting: {str(e)}"
+            }
+    
+    def _build_forecast_data(self, predicted: np.ndarray, lower: np.ndarray, upper: np.ndarray):
+        """Attach future dates to forecast values in the configured output format"""
+        with self.profiler.stage("build_response"):
+            return self._format_forecast(predicted, lower, upper)
+    
+    def _format_forecast(self, predicted: np.ndarray, lower: np.ndarray, upper: np.ndarray):
+        last_date = self.data.index[-1]
+        offset = self._get_forecast_offset()
+        future_dates = pd.date_range(
+            start=last_date + offset,
+            periods=len(predicted),
+            freq=offset
+        )
+        
+        if self.output_format == "compact":
+            forecast_data = encode_columns(
+                future_dates,
+                {"predicted": predicted, "lower": lower, "upper": upper},
+                precision=self.float_precision,
+                max_points=self.max_output_points
+            )
+        else:
+            forecast_data = []
+            for i, date in enumerate(future_dates):
+                forecast_data.append({
+                    "date": date.isoformat(),
+                    "predicted": float(predicted[i]),
+                    "lower": float(lower[i]),
+                    "upper": float(upper[i])
+                })
+        
+        return forecast_data, offset
+    
+    def backtest(self, horizon: int = 7, folds: int = 5, step: Optional[int] = None) -> Dict[str, Any]:
+        """Rolling-origin backtest of the forecasting model on the prepared series"""
+        if self.data is None:
+            return {"success": False, "error": "No data prepared for backtesting"}
+        
+        values = self._get_series().to_numpy(dtype=float)
+        step = step or horizon
+        
+        # Choose the order on data before the first fold so it does not see the test points
+        order = (1, 1, 1)
+        if self.order_search:
+            first_origin = len(values) - horizon - step * (folds - 1)
+            if first_origin >= 20:
+                order = select_arima_order(values[:first_origin], time_budget=self.search_budget)["order"]
+        
+        return rolling_origin_backtest(values, horizon=horizon, folds=folds, step=step, order=order)
+    
+    def forecast_hierarchy(self, data: List[Dict[str, Any]], date_column: str, value_column: str, levels: List[str],
+                           periods: int = 30, reconciliation: str = "mint") -> Dict[str, Any]:
+        """Forecast every node of the tree over levels (e.g. category/region/channel) and reconcile them.
+        
+        Runs plan_hierarchy, the node forecasts and reconcile_hierarchy in this
+        process; the routes run the three steps as separate jobs so the node
+        forecasts can be spread over the worker pool.
+        """
+        if reconciliation not in hierarchy.RECONCILIATION_METHODS:
+            return {
+                "success": False,
+                "error": f"Unknown reconciliation method '{reconciliation}' (use {', '.join(hierarchy.RECONCILIATION_METHODS)})"
+            }
+        
+        plan = self.plan_hierarchy(data, date_column, value_column, levels)
+        if not plan.get("success"):
+            return plan
+        
+        with self.profiler.stage("node_forecasts"):
+            base = hierarchy.forecast_nodes(plan.pop("nodeValues"), periods, plan["model"], plan["seasonLength"])
+        return self.reconcile_hierarchy(plan, base, periods, reconciliation)
+    
+    def plan_hierarchy(self, data: List[Dict[str, Any]], date_column: str, value_column: str,
+                       levels: List[str]) -> Dict[str, Any]:
+        """Build the node series of the tree over levels and pick their model tier.
+        
+        Leaves are the distinct level combinations, summed per date (missing
+        dates count as zero); every prefix of the levels is an aggregate node.
+        All nodes share one model tier, picked from the total series as in
+        forecast(). Returns the node series (rows ordered as the summing
+        matrix's, to be forecast with hierarchy.forecast_nodes in any row
+        batches) and what reconcile_hierarchy needs.
+        """
+        try:
+            with self.profiler.stage("prepare"):
+                df = pd.DataFrame(data, columns=[date_column, value_column, *levels])
+                df[date_column] = parse_dates(df[date_column], self.date_format)
+                df[value_column] = pd.to_numeric(df[value_column], errors='coerce')
+                df = df.dropna(subset=[value_column])
+                df[levels] = df[levels].fillna("Unknown").astype(str)
+                
+                # One column per leaf, one row per date
+                frame = df.groupby([date_column, *levels])[value_column].sum().unstack(levels, fill_value=0.0).sort_index()
+                if self.resample_freq:
+                    frame = getattr(frame.resample(self.resample_freq), self.resample_agg)().fillna(0.0)
+                if self.max_points and len(frame) > self.max_points:
+                    frame = frame.iloc[-self.max_points:]
+                del df
+            
+            if len(frame) < 3:
+                return {"success": False, "error": "Insufficient data for forecasting (need at least 3 data points)"}
+            
+            leaves = frame.columns
+            if not isinstance(leaves, pd.MultiIndex):
+                leaves = pd.MultiIndex.from_arrays([leaves], names=levels)
+            
+            with self.profiler.stage("aggregate"):
+                summing, nodes = hierarchy.build_summing_matrix(leaves)
+                node_values = summing @ frame.to_numpy(dtype=float).T
+                index = frame.index
+                del frame
+            
+            # The total series drives period detection, model selection and forecast dates
+            self.prepare_series(pd.Series(node_values[0], index=index, name=value_column))
+            period_info = self.detect_period()
+            season_length = period_info["period"] if period_info["method"] != "default" else 1
+            if self.model_type in ("auto", "prophet"):
+                model, reason = forecasters.select_model(node_values.shape[1], season_length, self.latency_budget)
+            elif self.model_type in forecasters.MODEL_TIERS:
+                model, reason = self.model_type, "requested"
+            else:
+                return {"success": False, "error": f"Unknown model type '{self.model_type}'"}
+            
+            return {
+                "success": True,
+                "nodeValues": node_values,
+                "summing": summing,
+                "nodes": nodes,
+                "levels": levels,
+                "leafCount": len(leaves),
+                "lastDate": index[-1],
+                "offset": self._get_forecast_offset(),
+                "historicalPoints": len(index),
+                "model": model,
+                "reason": reason,
+                "seasonLength": season_length
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Error in hierarchical forecasting: {str(e)}"
+            }
+    
+    def reconcile_hierarchy(self, plan: Dict[str, Any], base: Dict[str, np.ndarray], periods: int = 30,
+                            reconciliation: str = "mint") -> Dict[str, Any]:
+        """Reconcile the base node forecasts of a plan_hierarchy plan and build the response.
+        
+        Reconciled intervals keep the width of the base forecast.
+        """
+        try:
+            summing, nodes, offset = plan["summing"], plan["nodes"], plan["offset"]
+            
+            with self.profiler.stage("reconciliation"):
+                # One-step forecast error variances, recovered from the first interval
+                variances = ((base["upper"][:, 0] - base["lower"][:, 0]) / (2 * forecasters.Z_95)) ** 2
+                n_aggregate = len(nodes) - plan["leafCount"]
+                incoherence = float(np.abs(summing @ base["predicted"][n_aggregate:] - base["predicted"]).max())
+                reconciled = hierarchy.reconcile(summing, base["predicted"], reconciliation, variances)
+                half_width = (base["upper"] - base["lower"]) / 2
+            
+            with self.profiler.stage("build_response"):
+                future_dates = pd.date_range(start=plan["lastDate"] + offset, periods=periods, freq=offset)
+                date_strings = [date.isoformat() for date in future_dates]
+                
+                for i, node in enumerate(nodes):
+                    columns = {
+                        "predicted": reconciled[i],
+                        "lower": reconciled[i] - half_width[i],
+                        "upper": reconciled[i] + half_width[i],
+                        "base": base["predicted"][i]
+                    }
+                    node["model"] = MODEL_NAMES[base["models"][i]]
+                    if self.output_format == "compact":
+                        node["forecast"] = encode_columns(future_dates, columns, precision=self.float_precision)
+                    else:
+                        node["forecast"] = [
+                            {"date": date_strings[step], **{name: float(values[step]) for name, values in columns.items()}}
+                            for step in range(periods)
+                        ]
+            
+            return {
+                "success": True,
+                "modelType": MODEL_NAMES[plan["model"]],
+                "levels": plan["levels"],
+                "reconciliation": reconciliation,
+                "nodeCount": len(nodes),
+                "leafCount": plan["leafCount"],
+                "metrics": {
+                    "baseIncoherence": incoherence,
+                    "historicalPoints": plan["historicalPoints"]
+                },
+                "parameters": {
+                    "frequency": offset.freqstr,
+                    "seasonLength": plan["seasonLength"],
+                    "periods": periods,
+                    "modelSelection": {"requested": self.model_type, "selected": plan["model"], "reason": plan["reason"]}
+                },
+                "nodes": nodes
+            }
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Error in hierarchical forecasting: {str(e)}"
+            }
+    
+    def _fit_arima(self, order, values: np.ndarray):
+        """Fit ARIMA, starting from stored parameters when possible.
+        
+        Returns the results, the fit mode ("cold", "warm" or "update") and the
+        number of consecutive updates since parameters were last estimated.
+        """
+        model = ARIMA(self._get_series(), order=order)
+        state = self.warm_start
+        
+        # States are only reused under the same order selection mode
+        if (state and tuple(state.get("order", ())) == tuple(order)
+                and state.get("orderSearch", False) == self.order_search):
+            params = np.asarray(state.get("params", []), dtype=float)
+            nobs = state.get("nobs", 0)
+            updates = state.get("updatesSinceFit", 0)
+            appended = (
+                0 < nobs <= len(values)
+                and _hash_values(values[:nobs]) == state.get("prefixHash")
+            )
+            
+            try:
+                # Only new rows were appended: run the state-space filter over
+                # the series with the stored parameters instead of optimizing
+                if appended and len(values) - nobs <= nobs // 2 and updates < self.MAX_STATE_UPDATES:
+                    return model.filter(params), "update", updates + 1
+                
+                return model.fit(start_params=params), "warm", 0
+            except Exception:
+                # Stored parameters do not fit this model, fall back to a cold fit
+                pass
+        
+        return model.fit(), "cold", 0
+    
     def generate_insights(self, trend_data: Dict[str, Any], forecast_data: Dict[str, Any], seasonal_data: Dict[str, Any]) -> List[str]:
         """Generate AI insights from analysis"""
         insights = []
@@ -250,19 +983,28 @@ class TimeSeriesPredictor:
         
         return insights
     
-    def analyze(self, data: List[Dict[str, Any]], date_column: str, value_column: str, forecast_periods: int = 30) -> Dict[str, Any]:
-        """Complete analysis pipeline"""
+    def analyze(self, data: Union[List[Dict[str, Any]], ColumnarDataset, pd.Series], date_column: str, value_column: str, forecast_periods: int = 30) -> Dict[str, Any]:
+        """Complete analysis pipeline.
+        
+        Per-stage wall time, CPU time and (with profile_memory) allocated memory
+        are returned in the timings block.
+        """
         try:
             # Prepare data
-            self.prepare_data(data, date_column, value_column)
+            with self.profiler.stage("prepare"):
+                self.prepare_data(data, date_column, value_column)
             
             # Perform analyses
-            trend_data = self.detect_trend()
-            seasonal_data = self.seasonal_decomposition()
-            forecast_data = self.forecast_arima(forecast_periods)
+            with self.profiler.stage("trend"):
+                trend_data = self.detect_trend()
+            with self.profiler.stage("seasonality"):
+                seasonal_data = self.seasonal_decomposition()
+            with self.profiler.stage("forecast"):
+                forecast_data = self.forecast(forecast_periods)
             
             # Generate insights
-            insights = self.generate_insights(trend_data, forecast_data, seasonal_data)
+            with self.profiler.stage("insights"):
+                insights = self.generate_insights(trend_data, forecast_data, seasonal_data)
             
             return {
                 "success": True,
@@ -274,11 +1016,95 @@ class TimeSeriesPredictor:
                 "dateRange": {
                     "start": self.data.index[0].isoformat(),
                     "end": self.data.index[-1].isoformat()
-                }
+                },
+                "timings": self.profiler.report()
             }
             
         except Exception as e:
             return {
                 "success": False,
                 "error": f"Error in analysis: {str(e)}"
-            }
\ No newline at end of file
+            }
+
+
+# Display names reported as modelType
+MODEL_NAMES = {
+    "seasonal_naive": "SeasonalNaive",
+    "linear": "LinearTrend",
+    "ses": "SimpleExponentialSmoothing",
+    "holt_winters": "HoltWinters",
+    "arima": "ARIMA",
+}
+
+# Natural seasonal cycles per sampling frequency
+SEASONAL_PERIODS = {
+    "minute": (60, 1440),
+    "hourly": (24, 168),
+    "daily": (7, 30, 365),
+    "weekly": (52,),
+    "monthly": (12,),
+    "quarterly": (4,),
+}
+
+
+def _infer_frequency(index: pd.Index) -> Optional[str]:
+    """Infer the sampling frequency from the median spacing of a datetime index"""
+    if not isinstance(index, pd.DatetimeIndex) or len(index) < 2:
+        return None
+    
+    deltas = np.diff(index.values).astype('timedelta64[ms]').astype(float)
+    spacing = np.median(deltas) / 1000 / 3600  # hours
+    if spacing <= 0:
+        return None
+    if spacing < 0.5:
+        return "minute"
+    if spacing < 12:
+        return "hourly"
+    if spacing < 3 * 24:
+        return "daily"
+    if spacing < 14 * 24:
+        return "weekly"
+    if spacing < 60 * 24:
+        return "monthly"
+    if spacing < 120 * 24:
+        return "quarterly"
+    return "yearly"
+
+
+def _autocorrelation(values: np.ndarray) -> np.ndarray:
+    """Autocorrelation at every lag, computed with one FFT"""
+    n = len(values)
+    centered = values - values.mean()
+    spectrum = np.fft.rfft(centered, 2 * n)
+    acf = np.fft.irfft(spectrum * np.conj(spectrum))[:n]
+    return acf / acf[0] if acf[0] > 0 else np.zeros(n)
+
+
+def _hash_values(values: np.ndarray) -> str:
+    """Hash series values to recognise data that was only appended to"""
+    return hashlib.sha256(np.ascontiguousarray(values, dtype=float).tobytes()).hexdigest()
+
+
+def build_series(data: List[Dict[str, Any]], date_column: str, value_columns: Optional[List[str]] = None,
+                 group_by: Optional[str] = None, value_column: Optional[str] = None,
+                 date_format: Optional[str] = None) -> Dict[str, pd.Series]:
+    """Split a dataset into date-indexed numeric series, parsing the frame only once.
+
+    Either one series per column in value_columns (wide format), or one series
+    of value_column per distinct value of group_by (long format).
+    """
+    df = pd.DataFrame(data)
+    df[date_column] = parse_dates(df[date_column], date_format)
+    df = df.sort_values(date_column).set_index(date_column)
+    
+    if group_by:
+        values = pd.to_numeric(df[value_column], errors='coerce')
+        return {
+            str(key): group.rename(str(key))
+            for key, group in values.groupby(df[group_by], sort=False)
+        }
+    
+    return {
+        str(column): pd.to_numeric(df[column], errors='coerce').rename(str(column))
+        for column in value_columns
+    }
@@ -0,0 +1,178 @@
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+# Upper bounds (ms) of the wall-time histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# tracemalloc is process-wide, so profilers tracking memory share one tracing session
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_owns_tracing = False
+
+
+def _acquire_tracing():
+    global _tracing_users, _owns_tracing
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _owns_tracing = True
+        _tracing_users += 1
+
+
+def _release_tracing():
+    global _tracing_users, _owns_tracing
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _owns_tracing:
+            tracemalloc.stop()
+            _owns_tracing = False
+
+
+class StageProfiler:
+    """Records wall time, CPU time and (optionally) allocated memory per named stage.
+
+    Stages nest: a stage entered inside another is recorded under the path
+    "outer/inner", and re-entering a stage accumulates into the same entry.
+    Memory is measured with tracemalloc, which slows execution noticeably, so
+    it is only tracked when asked for. Peaks are approximate when several
+    profiled jobs share a process (thread execution mode).
+    """
+
+    def __init__(self, track_memory: bool = False):
+        self.track_memory = track_memory
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._stack: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        parent = self._stack[-1] if self._stack else None
+        frame = {"path": f"{parent['path']}/{name}" if parent else name, "peak": 0, "start": 0}
+
+        if self.track_memory:
+            if parent is None:
+                _acquire_tracing()
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                # The parent's peak so far is lost when the peak is reset for this stage
+                parent["peak"] = max(parent["peak"], peak)
+            tracemalloc.reset_peak()
+            frame["start"] = current
+
+        self._stack.append(frame)
+        wall_started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            yield
+        finally:
+            wall_ms = (time.perf_counter() - wall_started) * 1000
+            cpu_ms = (time.thread_time() - cpu_started) * 1000
+            self._stack.pop()
+
+            entry = self.stages.setdefault(frame["path"], {"calls": 0, "wallMs": 0.0, "cpuMs": 0.0})
+            entry["calls"] += 1
+            entry["wallMs"] += wall_ms
+            entry["cpuMs"] += cpu_ms
+
+            if self.track_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, frame["peak"])
+                entry["peakAllocatedBytes"] = max(entry.get("peakAllocatedBytes", 0), peak - frame["start"])
+                entry["netAllocatedBytes"] = entry.get("netAllocatedBytes", 0) + current - frame["start"]
+                if parent is not None:
+                    parent["peak"] = max(parent["peak"], peak)
+                else:
+                    _release_tracing()
+
+    def include(self, report: Optional[Dict[str, Any]], prefix: str):
+        """Add the stages of another profiler's report (e.g. from a worker) under a prefix"""
+        for path, stage in ((report or {}).get("stages") or {}).items():
+            self.stages[f"{prefix}/{path}"] = dict(stage)
+
+    def report(self) -> Dict[str, Any]:
+        """Get the recorded stages with rounded values"""
+        stages = {
+            path: {key: round(value, 3) if isinstance(value, float) else value for key, value in stage.items()}
+            for path, stage in self.stages.items()
+        }
+        return {
+            "stages": stages,
+            "totalWallMs": round(sum(stage["wallMs"] for path, stage in self.stages.items() if "/" not in path), 3),
+            "memoryTracked": self.track_memory
+        }
+
+
+class StageHistograms:
+    """Aggregates stage timings across requests into wall-time histograms per operation"""
+
+    def __init__(self, buckets_ms: Tuple[float, ...] = HISTOGRAM_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self._lock = threading.Lock()
+        self._stages: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.started_at = datetime.utcnow()
+
+    def record(self, operation: str, report: Optional[Dict[str, Any]]):
+        """Add every stage of a profiler report to the histograms of an operation"""
+        with self._lock:
+            for path, stage in ((report or {}).get("stages") or {}).items():
+                histogram = self._stages.setdefault((operation, path), {
+                    "count": 0,
+                    "wallMsSum": 0.0,
+                    "cpuMsSum": 0.0,
+                    "maxWallMs": 0.0,
+                    "maxPeakAllocatedBytes": None,
+                    "buckets": [0] * (len(self.buckets_ms) + 1)
+                })
+                wall_ms = stage["wallMs"]
+                histogram["count"] += 1
+                histogram["wallMsSum"] += wall_ms
+                histogram["cpuMsSum"] += stage["cpuMs"]
+                histogram["maxWallMs"] = max(histogram["maxWallMs"], wall_ms)
+                histogram["buckets"][bisect_left(self.buckets_ms, wall_ms)] += 1
+                if "peakAllocatedBytes" in stage:
+                    histogram["maxPeakAllocatedBytes"] = max(histogram["maxPeakAllocatedBytes"] or 0, stage["peakAllocatedBytes"])
+
+    def _quantile(self, buckets: List[int], count: int, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None when it is the open-ended bucket)"""
+        target = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets_ms, buckets):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return bound
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the aggregated histograms grouped by operation and stage"""
+        with self._lock:
+            operations: Dict[str, Dict[str, Any]] = {}
+            for (operation, path), histogram in sorted(self._stages.items()):
+                count = histogram["count"]
+                operations.setdefault(operation, {})[path] = {
+                    "count": count,
+                    "meanWallMs": round(histogram["wallMsSum"] / count, 3),
+                    "meanCpuMs": round(histogram["cpuMsSum"] / count, 3),
+                    "maxWallMs": round(histogram["maxWallMs"], 3),
+                    "p50WallMs": self._quantile(histogram["buckets"], count, 0.5),
+                    "p95WallMs": self._quantile(histogram["buckets"], count, 0.95),
+                    "maxPeakAllocatedBytes": histogram["maxPeakAllocatedBytes"],
+                    "buckets": list(histogram["buckets"])
+                }
+            return {
+                "since": self.started_at.isoformat(),
+                "bucketBoundsMs": list(self.buckets_ms),
+                "operations": operations
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self.started_at = datetime.utcnow()
+
+
+# Global histograms, aggregated in the API process
+stage_metrics = StageHistograms()
@@ -0,0 +1,136 @@
+import math
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+
+class RunningStats:
+    """Count, mean, variance, min and max of a column, updated a chunk at a time.
+
+    Each chunk's moments are computed vectorized and merged into the running
+    ones with Chan et al.'s pairwise update (the batched form of Welford's
+    algorithm), which stays accurate when the mean is large relative to the
+    spread. NaN values are skipped, as pandas does.
+    """
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0,
+                 minimum: Optional[float] = None, maximum: Optional[float] = None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+
+    def update(self, values: np.ndarray):
+        """Add a chunk of values"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            mean = float(values.mean())
+            self.merge(RunningStats(len(values), mean, float(((values - mean) ** 2).sum()),
+                                    float(values.min()), float(values.max())))
+
+    def merge(self, other: "RunningStats"):
+        """Combine with the statistics of another part of the column"""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2, self.min, self.max = other.count, other.mean, other.m2, other.min, other.max
+            return
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1, like pandas)"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the state to persist with the dataset"""
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "RunningStats":
+        return cls(state["count"], state["mean"], state["m2"], state["min"], state["max"])
+
+
+class TDigest:
+    """Mergeable quantile sketch of a column (Dunning's t-digest).
+
+    Values are summarized as weighted centroids. The k1 scale function bounds
+    each centroid's share of the rank so that centroids are small near the
+    tails, which keeps extreme percentiles accurate while the digest holds
+    about compression / 2 centroids however many values it has seen. Digests
+    of two parts of a column merge into a digest of the whole, so a chunk of
+    rows is added in O(chunk) without revisiting earlier rows.
+    """
+
+    def __init__(self, compression: float = 200.0, means: Optional[List[float]] = None,
+                 weights: Optional[List[float]] = None, minimum: Optional[float] = None, maximum: Optional[float] = None):
+        self.compression = compression
+        self.means = np.asarray(means if means is not None else [], dtype=float)
+        self.weights = np.asarray(weights if weights is not None else [], dtype=float)
+        self.min = minimum
+        self.max = maximum
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def update(self, values: np.ndarray):
+        """Add a chunk of values"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self._absorb(values, np.ones(len(values)), float(values.min()), float(values.max()))
+
+    def merge(self, other: "TDigest"):
+        """Combine with the digest of another part of the column"""
+        if len(other.means):
+            self._absorb(other.means, other.weights, other.min, other.max)
+
+    def _absorb(self, means: np.ndarray, weights: np.ndarray, minimum: float, maximum: float):
+        means = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+
+        # Centroids whose left edge falls in the same unit of the scale
+        # function are merged into one
+        left = (np.cumsum(weights) - weights) / weights.sum()
+        scale = self.compression / (2 * math.pi) * np.arcsin(2 * left - 1)
+        bins = np.floor(scale)
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+        self.min = minimum if self.min is None else min(self.min, minimum)
+        self.max = maximum if self.max is None else max(self.max, maximum)
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-quantile (0 <= q <= 1), interpolating between centroids"""
+        if not len(self.means):
+            return math.nan
+        centers = np.cumsum(self.weights) - self.weights / 2
+        total = self.count
+        return float(np.interp(q * total, np.r_[0.0, centers, total], np.r_[self.min, self.means, self.max]))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the state to persist with the dataset"""
+        return {
+            "compression": self.compression,
+            "means": self.means.tolist(),
+            "weights": self.weights.tolist(),
+            "min": self.min,
+            "max": self.max
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "TDigest":
+        return cls(state["compression"], state["means"], state["weights"], state["min"], state["max"])
@@ -0,0 +1,121 @@
+import asyncio
+import importlib
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from ml.executor import predictor_executor
+
+logger = logging.getLogger(__name__)
+
+# The heavy part of the ML stack, in import order
+ML_MODULES = (
+    "numpy",
+    "pandas",
+    "scipy.signal",
+    "scipy.sparse.linalg",
+    "statsmodels.tsa.seasonal",
+    "statsmodels.tsa.arima.model",
+    "ml.predictor",
+    "ml.hierarchy",
+)
+
+
+def warm_up() -> Dict[str, Any]:
+    """Import the ML stack and run a small analysis so first-call setup is paid up front.
+
+    Lives at module level so it can run in predictor worker processes.
+    """
+    started = time.perf_counter()
+    for name in ML_MODULES:
+        importlib.import_module(name)
+    imported = time.perf_counter()
+
+    import numpy as np
+    import pandas as pd
+    from ml.predictor import TimeSeriesPredictor
+
+    # Touches date parsing, period detection, decomposition, ARIMA fitting and the light tiers
+    steps = np.arange(60)
+    data = {
+        "date": pd.date_range("2024-01-01", periods=len(steps), freq="D"),
+        "value": 100 + 0.5 * steps + 10 * np.sin(2 * np.pi * steps / 7)
+    }
+    TimeSeriesPredictor().analyze(data, "date", "value", forecast_periods=7)
+    TimeSeriesPredictor(model_type="ses").analyze(data, "date", "value", forecast_periods=7)
+
+    return {
+        "pid": os.getpid(),
+        "importSeconds": round(imported - started, 3),
+        "totalSeconds": round(time.perf_counter() - started, 3)
+    }
+
+
+class PredictorWarmup:
+    """Warms the ML stack in the background after startup.
+
+    Readiness does not wait for it: requests arriving earlier import what they
+    need themselves. The API process is warmed in a thread (routes use pandas
+    for validation and batch splitting); in process execution mode every
+    predictor worker is started and warmed as well.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("PREDICTOR_WARMUP", "true").lower() not in ("0", "false", "no")
+        self.state = "cold"
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self.details: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Schedule the warm-up without waiting for it"""
+        if not self.enabled or self._task:
+            return
+        self.state = "warming"
+        self.started_at = datetime.utcnow()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        try:
+            self.details["api"] = await asyncio.to_thread(warm_up)
+            if predictor_executor.mode == "process":
+                # Concurrent jobs make the pool start all of its workers
+                self.details["workers"] = await asyncio.gather(
+                    *(predictor_executor.run(warm_up) for _ in range(predictor_executor.max_workers))
+                )
+            self.state = "warm"
+            logger.info(f"Predictor warm-up finished in {(datetime.utcnow() - self.started_at).total_seconds():.2f}s")
+        except asyncio.CancelledError:
+            self.state = "cold"
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.warning(f"Predictor warm-up failed: {e}")
+        finally:
+            self.finished_at = datetime.utcnow()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the warm-up state for health checks"""
+        return {
+            "state": self.state if self.enabled else "disabled",
+            "warm": self.state == "warm",
+            "startedAt": self.started_at.isoformat() if self.started_at else None,
+            "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+            "workersWarmed": len({worker["pid"] for worker in self.details.get("workers", [])}),
+            "error": self.error
+        }
+
+
+# Global warm-up instance
+predictor_warmup = PredictorWarmup()
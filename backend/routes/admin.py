@@ -4,6 +4,7 @@ from typing import Optional
 from database import get_database
 from services.auth_service import AuthService
 from services.data_service import DataService
+from ml.profiling import stage_metrics
 from routes.auth import get_current_user
 
 router = APIRouter(prefix="/api/admin", tags=["Admin"])
@@ -142,4 +143,15 @@ async def get_system_stats(admin_user: dict = Depends(require_admin)):
             "totalDatasets": datasets_count,
             "totalPredictions": predictions_count
         }
-    }
\ No newline at end of file
+    }
+
+@router.get("/predictor/timings", response_model=dict)
+async def get_predictor_timings(admin_user: dict = Depends(require_admin)):
+    """Get aggregated per-stage prediction timing histograms (admin only)"""
+    return {"success": True, "timings": stage_metrics.snapshot()}
+
+@router.delete("/predictor/timings", response_model=dict)
+async def reset_predictor_timings(admin_user: dict = Depends(require_admin)):
+    """Reset the prediction timing histograms (admin only)"""
+    stage_metrics.reset()
+    return {"success": True, "message": "Timing histograms reset"}
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional, List
 import json
 
 from database import get_database
@@ -22,9 +23,6 @@ async def upload_dataset(
             detail="Only CSV and Excel files are supported"
         )
     
-    # Read file content
-    content = await file.read()
-    
     # Parse metadata if provided
     metadata_dict = None
     if metadata:
@@ -37,8 +35,10 @@ async def upload_dataset(
     db = await get_database()
     data_service = DataService(db)
     
+    # The multipart parser has already spooled the upload to a temporary file
+    # (on disk beyond 1 MB); it is parsed from there in chunks
     result = await data_service.upload_dataset(
-        content,
+        file.file,
         file.filename,
         current_user["user_id"],
         metadata_dict
@@ -93,8 +93,169 @@ async def get_dataset(
             detail="Not authorized to access this dataset"
         )
     
+    if include_data:
+        dataset["data"] = [dict(zip(row, _json_values(list(row.values())))) for row in dataset["data"]]
     return {"success": True, "dataset": dataset}
 
+async def _get_readable_dataset(data_service: DataService, dataset_id: str, current_user: dict) -> dict:
+    """Get a dataset's metadata, checking that the current user may read it"""
+    dataset = await data_service.get_dataset_by_id(dataset_id)
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    if current_user.get("role") != "admin" and dataset.get("userId") != current_user["user_id"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this dataset"
+        )
+    
+    return dataset
+
+def _parse_columns(columns: Optional[str], dataset: dict) -> Optional[List[str]]:
+    """Parse a comma-separated column list, rejecting columns the dataset does not have"""
+    if not columns:
+        return None
+    
+    selected = [column.strip() for column in columns.split(",") if column.strip()]
+    unknown = [column for column in selected if column not in dataset.get("columns", [])]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Columns not found in dataset: {', '.join(unknown)}"
+        )
+    return selected
+
+def _json_values(values: list) -> list:
+    """Replace NaN and NaT (missing numbers and dates), which JSON cannot carry, with null"""
+    # They are the only stored values that are not equal to themselves
+    return [None if value != value else value for value in values]
+
+@router.get("/datasets/{dataset_id}/percentiles", response_model=dict)
+async def get_dataset_percentiles(
+    dataset_id: str,
+    p: str = "50,90,99",
+    columns: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Estimate percentiles (comma-separated, 0-100) of the dataset's value columns.
+    
+    Answered from the quantile digests kept with the dataset, without reading
+    its rows; estimates are accurate to a small fraction of a percentile rank.
+    """
+    db = await get_database()
+    data_service = DataService(db)
+    
+    dataset = await _get_readable_dataset(data_service, dataset_id, current_user)
+    selected = _parse_columns(columns, dataset)
+    not_numeric = [column for column in selected or [] if column not in dataset.get("valueColumns", [])]
+    if not_numeric:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Not numeric value columns: {', '.join(not_numeric)}"
+        )
+    
+    try:
+        percentiles = [float(value) for value in p.split(",") if value.strip()]
+    except ValueError:
+        percentiles = []
+    if not percentiles or any(not 0 <= percentile <= 100 for percentile in percentiles):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Percentiles must be comma-separated numbers between 0 and 100"
+        )
+    
+    return {
+        "success": True,
+        "datasetId": dataset_id,
+        "rowCount": dataset.get("rowCount"),
+        "percentiles": await data_service.get_percentiles(dataset, percentiles, selected),
+        "approximate": True
+    }
+
+@router.get("/datasets/{dataset_id}/rows", response_model=dict)
+async def get_dataset_rows(
+    dataset_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=50000),
+    columns: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a range of rows of a dataset, optionally only some columns (comma-separated)"""
+    db = await get_database()
+    data_service = DataService(db)
+    
+    dataset = await _get_readable_dataset(data_service, dataset_id, current_user)
+    selected = _parse_columns(columns, dataset)
+    
+    rows = await data_service.get_dataset_data(dataset_id, selected, offset, offset + limit)
+    rows = [dict(zip(row, _json_values(list(row.values())))) for row in rows]
+    return {
+        "success": True,
+        "datasetId": dataset_id,
+        "offset": offset,
+        "count": len(rows),
+        "totalRows": dataset.get("rowCount", 0),
+        "rows": rows
+    }
+
+@router.get("/datasets/{dataset_id}/rows/stream")
+async def stream_dataset_rows(
+    dataset_id: str,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    columns: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream a dataset as NDJSON, one line of column arrays per stored chunk"""
+    db = await get_database()
+    data_service = DataService(db)
+    
+    dataset = await _get_readable_dataset(data_service, dataset_id, current_user)
+    selected = _parse_columns(columns, dataset)
+    stop = offset + limit if limit else None
+    
+    async def stream_chunks():
+        row_start = offset
+        async for part in data_service.iter_dataset_chunks(dataset_id, selected, offset, stop):
+            count = len(next(iter(part.values()), []))
+            part = {column: _json_values(values) for column, values in part.items()}
+            yield json.dumps({"rowStart": row_start, "rowCount": count, "columns": part}, default=str) + "\n"
+            row_start += count
+    
+    return StreamingResponse(stream_chunks(), media_type="application/x-ndjson")
+
+@router.post("/datasets/{dataset_id}/append", response_model=dict)
+async def append_dataset_rows(
+    dataset_id: str,
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Append the rows of a CSV or Excel file with the dataset's columns to a dataset"""
+    if not file.filename.endswith(('.csv', '.xlsx', '.xls')):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only CSV and Excel files are supported"
+        )
+    
+    db = await get_database()
+    data_service = DataService(db)
+    
+    await _get_readable_dataset(data_service, dataset_id, current_user)
+    
+    result = await data_service.append_rows(dataset_id, file.file, file.filename)
+    
+    if not result["success"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=result["error"]
+        )
+    
+    return result
+
 @router.delete("/datasets/{dataset_id}", response_model=dict)
 async def delete_dataset(
     dataset_id: str,
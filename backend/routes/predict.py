@@ -1,12 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
+import asyncio
+import json
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
 
 from database import get_database
 from services.data_service import DataService
-from ml.predictor import TimeSeriesPredictor
+from services.cache_service import CacheService
+from services.schema_inference import schema_date_format
+from services.job_service import job_scheduler, ProgressCallback
+from ml.executor import (
+    predictor_executor, run_analysis, run_prepare, run_trend, run_seasonality, run_anomalies, run_forecast,
+    backtest, forecast_hierarchy, search_arima_order, PredictionTimeoutError
+)
+from ml.profiling import StageProfiler, stage_metrics
 from routes.auth import get_current_user
 
+# ml.predictor, ml.forecasters and ml.hierarchy are imported inside the handlers:
+# they pull in pandas and statsmodels, which ml.warmup loads after startup
+
 router = APIRouter(prefix="/api/predict", tags=["Predictions"])
 
 class PredictionRequest(BaseModel):
@@ -14,19 +32,189 @@ class PredictionRequest(BaseModel):
     dateColumn: str
     valueColumn: str
     forecastPeriods: int = 30
-    modelType: str = "arima"  # arima or prophet
+    modelType: str = "arima"  # arima, auto, seasonal_naive, linear, ses or holt_winters (prophet selects automatically)
+    latencyBudget: Optional[float] = None  # seconds, guides automatic model selection
+    orderSearch: bool = False  # search ARIMA (p, d, q) instead of the fixed (1, 1, 1)
+    searchBudget: float = 5.0  # seconds
+    resampleFreq: Optional[str] = None  # pandas frequency, e.g. "D", "W", "h"
+    resampleAgg: str = "sum"  # sum, mean or last
+    maxPoints: Optional[int] = None  # keep only the most recent points
+    startDate: Optional[str] = None  # only use rows dated within [startDate, endDate]
+    endDate: Optional[str] = None
+    outputFormat: str = "records"  # records or compact (columnar arrays)
+    floatPrecision: Optional[int] = None  # compact only: decimals to keep
+    maxOutputPoints: Optional[int] = None  # compact only: LTTB-downsample chart series
+    encoding: str = "json"  # json or msgpack
+    includeTimings: bool = False  # return per-stage wall/CPU time and allocated memory
 
-@router.post("/analyze", response_model=dict)
-async def analyze_and_predict(
-    request: PredictionRequest,
-    current_user: dict = Depends(get_current_user)
-):
-    """Analyze dataset and generate predictions"""
-    db = await get_database()
-    data_service = DataService(db)
+class BatchPredictionRequest(BaseModel):
+    datasetId: str
+    dateColumn: str
+    valueColumns: Optional[List[str]] = None  # wide format: one series per column
+    groupBy: Optional[str] = None  # long format: one series of valueColumn per group
+    valueColumn: Optional[str] = None
+    forecastPeriods: int = 30
+    modelType: str = "arima"
+    latencyBudget: Optional[float] = None
+    orderSearch: bool = False
+    searchBudget: float = 5.0
+    resampleFreq: Optional[str] = None
+    resampleAgg: str = "sum"
+    maxPoints: Optional[int] = None
+    startDate: Optional[str] = None
+    endDate: Optional[str] = None
+    outputFormat: str = "records"
+    floatPrecision: Optional[int] = None
+    maxOutputPoints: Optional[int] = None
+    includeTimings: bool = False
+
+class BacktestRequest(BaseModel):
+    datasetId: str
+    dateColumn: str
+    valueColumn: str
+    horizon: int = 7
+    folds: int = 5
+    step: Optional[int] = None  # points between fold origins (defaults to horizon)
+    orderSearch: bool = False
+    searchBudget: float = 5.0
+    resampleFreq: Optional[str] = None
+    resampleAgg: str = "sum"
+    maxPoints: Optional[int] = None
+    startDate: Optional[str] = None
+    endDate: Optional[str] = None
+    includeTimings: bool = False
+
+class HierarchicalPredictionRequest(BaseModel):
+    datasetId: str
+    dateColumn: str
+    valueColumn: str
+    levels: List[str] = ["category", "region", "channel"]  # outermost first
+    forecastPeriods: int = 30
+    reconciliation: str = "mint"  # mint, ols or bottom_up
+    modelType: str = "auto"
+    latencyBudget: Optional[float] = 0.1  # seconds per node series
+    resampleFreq: Optional[str] = None
+    resampleAgg: str = "sum"
+    maxPoints: Optional[int] = None
+    startDate: Optional[str] = None
+    endDate: Optional[str] = None
+    outputFormat: str = "records"
+    floatPrecision: Optional[int] = None
+    encoding: str = "json"
+    includeTimings: bool = False
+
+class PredictionJobRequest(PredictionRequest):
+    priority: str = "normal"  # high, normal or low
+
+def _validate_resampling(resample_freq: Optional[str], resample_agg: str):
+    """Reject invalid resampling options before any work is done"""
+    from ml.predictor import TimeSeriesPredictor
     
-    # Get dataset
-    dataset = await data_service.get_dataset_by_id(request.datasetId, include_data=True)
+    error = TimeSeriesPredictor.validate_resampling(resample_freq, resample_agg)
+    if error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error
+        )
+
+def _validate_trend_options(mode: str, method: str):
+    """Reject unknown trend modes and methods before the cache lookup"""
+    if mode not in ("full", "fast"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported trend mode '{mode}' (use full or fast)"
+        )
+    if method not in ("ols", "theilsen"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported trend method '{method}' (use ols or theilsen)"
+        )
+
+def _model_options(model_type: str, latency_budget: Optional[float]) -> dict:
+    """Validate and build predictor options for model selection"""
+    from ml.forecasters import MODEL_TIERS
+    
+    if model_type not in (*MODEL_TIERS, "auto", "prophet"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported model type '{model_type}'"
+        )
+    return {"model_type": model_type, "latency_budget": latency_budget}
+
+def _output_options(output_format: str, float_precision: Optional[int], max_output_points: Optional[int],
+                    encoding: str = "json") -> dict:
+    """Validate and build predictor options for the response format"""
+    if output_format not in ("records", "compact"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported output format '{output_format}' (use records or compact)"
+        )
+    if encoding not in ("json", "msgpack") or (encoding == "msgpack" and not HAS_MSGPACK):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported encoding '{encoding}'"
+        )
+    return {"output_format": output_format, "float_precision": float_precision, "max_output_points": max_output_points}
+
+def _encode_response(response: dict, encoding: str):
+    """Serialize a response in the requested encoding"""
+    if encoding == "msgpack":
+        return Response(content=msgpack.packb(response, use_bin_type=True), media_type="application/msgpack")
+    return response
+
+def _attach_timings(response: dict, operation: str, profiler: StageProfiler, worker_timings: Optional[dict] = None,
+                    include: bool = False) -> dict:
+    """Record a request's stage timings in the histograms, returning them in the response if asked for.
+    
+    Worker stages are nested under the route's "compute" stage.
+    """
+    profiler.include(worker_timings, "compute")
+    timings = profiler.report()
+    stage_metrics.record(operation, timings)
+    return {**response, "timings": timings} if include else response
+
+def _resampling_options(resample_freq: Optional[str], resample_agg: str, max_points: Optional[int]) -> dict:
+    """Predictor options for the resampling stage"""
+    return {"resample_freq": resample_freq, "resample_agg": resample_agg, "max_points": max_points}
+
+def _series_settings(resampling: dict, date_range: dict) -> dict:
+    """Options that shape the fitted series, saved with predictions so model states are only reused on the same series"""
+    return {
+        "resampleFreq": resampling["resample_freq"],
+        "resampleAgg": resampling["resample_agg"],
+        "maxPoints": resampling["max_points"],
+        "startDate": date_range["start_date"],
+        "endDate": date_range["end_date"]
+    }
+
+def _date_range(start_date: Optional[str], end_date: Optional[str]) -> dict:
+    """Validate a date range filter, returning it as data service arguments"""
+    import pandas as pd
+    
+    bounds = []
+    for name, value in (("start date", start_date), ("end date", end_date)):
+        try:
+            bounds.append(pd.Timestamp(value) if value else None)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid {name} '{value}'"
+            )
+    try:
+        inverted = all(bound is not None for bound in bounds) and bounds[0] > bounds[1]
+    except TypeError:
+        # One bound has a time zone and the other not; compared per dataset later
+        inverted = False
+    if inverted:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start date must not be after end date"
+        )
+    return {"start_date": start_date, "end_date": end_date}
+
+async def _get_analysis_dataset(data_service: DataService, request: PredictionRequest, current_user: dict) -> dict:
+    """Load dataset metadata and validate an analysis request against it"""
+    dataset = await data_service.get_dataset_by_id(request.datasetId)
     
     if not dataset:
         raise HTTPException(
@@ -54,65 +242,267 @@ async def analyze_and_predict(
             detail=f"Value column '{request.valueColumn}' not found in dataset"
         )
     
-    # Perform analysis
-    predictor = TimeSeriesPredictor()
+    _validate_resampling(request.resampleFreq, request.resampleAgg)
+    _output_options(request.outputFormat, request.floatPrecision, request.maxOutputPoints, request.encoding)
+    _model_options(request.modelType, request.latencyBudget)
+    _date_range(request.startDate, request.endDate)
     
-    try:
-        analysis_result = predictor.analyze(
-            dataset.get("data", []),
+    return dataset
+
+async def _execute_analysis(
+    request: PredictionRequest,
+    dataset: dict,
+    user_id: str,
+    data_service: DataService,
+    cache_service: CacheService,
+    progress: Optional[ProgressCallback] = None
+) -> dict:
+    """Run the analysis pipeline for a validated request, using the result cache"""
+    async def report(stage: str, percent: int):
+        if progress:
+            await progress(stage, percent)
+    
+    resampling = _resampling_options(request.resampleFreq, request.resampleAgg, request.maxPoints)
+    output = _output_options(request.outputFormat, request.floatPrecision, request.maxOutputPoints, request.encoding)
+    model = _model_options(request.modelType, request.latencyBudget)
+    date_range = _date_range(request.startDate, request.endDate)
+    
+    profiler = StageProfiler()
+    
+    # Serve repeated analyses of unchanged data from the cache
+    with profiler.stage("cache_lookup"):
+        cache_key = CacheService.build_key(
+            await data_service.ensure_content_hash(dataset),
+            "analyze",
+            dateColumn=request.dateColumn,
+            valueColumn=request.valueColumn,
+            forecastPeriods=request.forecastPeriods,
+            orderSearch=request.orderSearch,
+            searchBudget=request.searchBudget if request.orderSearch else None,
+            **model,
+            **resampling,
+            **output,
+            **date_range
+        )
+        cached = await cache_service.get(cache_key)
+    if cached:
+        return _attach_timings({**cached, "cached": True}, "analyze", profiler, include=request.includeTimings)
+    
+    await report("loading", 10)
+    with profiler.stage("load_data"):
+        data = await data_service.get_series_data(dataset, request.dateColumn, request.valueColumn, **date_range)
+        model_states = await data_service.get_model_states(
+            request.datasetId, request.dateColumn, series_keys=[request.valueColumn], value_column=request.valueColumn,
+            series_settings=_series_settings(resampling, date_range)
+        )
+    
+    # Perform analysis
+    await report("analyzing", 30)
+    options = {
+        "order_search": request.orderSearch,
+        "search_budget": request.searchBudget,
+        "warm_start": model_states.get(request.valueColumn),
+        "profile_memory": request.includeTimings,
+        "date_format": schema_date_format(dataset, request.dateColumn),
+        **model,
+        **resampling,
+        **output
+    }
+    with profiler.stage("compute"):
+        if request.orderSearch:
+            # Searched before the analysis job so the candidate fits run as concurrent jobs;
+            # the analysis then takes the prepared series as is
+            with profiler.stage("order_search"):
+                prepared = await predictor_executor.run(run_prepare, data, request.dateColumn, request.valueColumn, options)
+                profiler.include(prepared.pop("timings", None), "compute/order_search")
+                if prepared.get("success"):
+                    data = prepared["series"]
+                    if prepared["model"] == "arima":
+                        options["order_selection"] = await search_arima_order(
+                            data.to_numpy(dtype=float), request.searchBudget
+                        )
+        analysis_result = await predictor_executor.run(
+            run_analysis,
+            data,
             request.dateColumn,
             request.valueColumn,
-            request.forecastPeriods
+            request.forecastPeriods,
+            options
         )
-        
-        if not analysis_result.get("success"):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=analysis_result.get("error", "Analysis failed")
-            )
-        
-        # Save prediction results
-        prediction_data = {
-            "datasetId": request.datasetId,
-            "userId": current_user["user_id"],
-            "modelType": request.modelType,
-            "predictions": analysis_result.get("forecast", {}).get("forecast", []),
-            "metrics": analysis_result.get("forecast", {}).get("metrics", {}),
-            "insights": analysis_result.get("insights", []),
-            "parameters": {
-                "dateColumn": request.dateColumn,
-                "valueColumn": request.valueColumn,
-                "forecastPeriods": request.forecastPeriods
-            }
+    worker_timings = analysis_result.pop("timings", None)
+    
+    if not analysis_result.get("success"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=analysis_result.get("error", "Analysis failed")
+        )
+    
+    # Save prediction results
+    await report("saving", 90)
+    prediction_data = {
+        "datasetId": request.datasetId,
+        "userId": user_id,
+        "modelType": analysis_result.get("forecast", {}).get("modelType", request.modelType),
+        "predictions": analysis_result.get("forecast", {}).get("forecast", []),
+        "metrics": analysis_result.get("forecast", {}).get("metrics", {}),
+        "insights": analysis_result.get("insights", []),
+        "modelState": analysis_result.get("forecast", {}).get("modelState"),
+        "parameters": {
+            "dateColumn": request.dateColumn,
+            "valueColumn": request.valueColumn,
+            "seriesKey": request.valueColumn,
+            "seriesSettings": _series_settings(resampling, date_range),
+            "forecastPeriods": request.forecastPeriods,
+            "order": analysis_result.get("forecast", {}).get("parameters", {}).get("order"),
+            "outputFormat": request.outputFormat
         }
-        
+    }
+    
+    with profiler.stage("save"):
         save_result = await data_service.save_prediction(prediction_data)
         
         # Return complete analysis
-        return {
+        response = {
             "success": True,
             "analysis": analysis_result,
             "predictionId": save_result.get("prediction", {}).get("id") if save_result.get("success") else None
         }
+        await cache_service.set(cache_key, request.datasetId, response)
+    
+    return _attach_timings(response, "analyze", profiler, worker_timings, request.includeTimings)
+
+@router.post("/analyze", response_model=dict)
+async def analyze_and_predict(
+    request: PredictionRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Analyze dataset and generate predictions"""
+    db = await get_database()
+    data_service = DataService(db)
+    cache_service = CacheService(db)
+    
+    # Get dataset metadata (rows are only loaded on a cache miss)
+    dataset = await _get_analysis_dataset(data_service, request, current_user)
+    
+    try:
+        response = await _execute_analysis(request, dataset, current_user["user_id"], data_service, cache_service)
+        return _encode_response(response, request.encoding)
         
+    except HTTPException:
+        raise
+    except PredictionTimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error during analysis: {str(e)}"
         )
 
+@router.post("/jobs", response_model=dict)
+async def submit_prediction_job(
+    request: PredictionJobRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Queue an analysis and return a job id immediately.
+    
+    Progress and completion are pushed on the prediction_jobs WebSocket topic
+    (job ID, status and progress only); details come from GET /jobs/{job_id}.
+    """
+    db = await get_database()
+    data_service = DataService(db)
+    cache_service = CacheService(db)
+    
+    dataset = await _get_analysis_dataset(data_service, request, current_user)
+    
+    async def runner(progress: ProgressCallback) -> dict:
+        response = await _execute_analysis(request, dataset, current_user["user_id"], data_service, cache_service, progress)
+        result = {"predictionId": response.get("predictionId"), "cached": response.get("cached", False)}
+        if "timings" in response:
+            result["timings"] = response["timings"]
+        return result
+    
+    job = await job_scheduler.submit(
+        current_user["user_id"],
+        runner,
+        request.priority,
+        {"datasetId": request.datasetId, "dateColumn": request.dateColumn, "valueColumn": request.valueColumn}
+    )
+    
+    return {"success": True, "job": job}
+
+@router.get("/jobs", response_model=dict)
+async def get_prediction_jobs(
+    limit: int = 50,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get recent prediction jobs"""
+    user_id = None if current_user.get("role") == "admin" else current_user["user_id"]
+    jobs = job_scheduler.get_jobs(user_id, limit)
+    
+    return {"success": True, "jobs": jobs, "total": len(jobs)}
+
+@router.get("/jobs/{job_id}", response_model=dict)
+async def get_prediction_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a prediction job's status"""
+    job = job_scheduler.get_job(job_id)
+    
+    if not job or (current_user.get("role") != "admin" and job["userId"] != current_user["user_id"]):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    return {"success": True, "job": job}
+
+@router.delete("/jobs/{job_id}", response_model=dict)
+async def cancel_prediction_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Cancel a queued or running prediction job"""
+    job = job_scheduler.get_job(job_id)
+    
+    if not job or (current_user.get("role") != "admin" and job["userId"] != current_user["user_id"]):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    if not await job_scheduler.cancel(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Job is already {job['status']}"
+        )
+    
+    return {"success": True, "message": "Job cancelled"}
+
 @router.get("/trends/{dataset_id}", response_model=dict)
 async def get_trends(
     dataset_id: str,
     date_column: str,
     value_column: str,
+    mode: str = "full",  # full (decomposition) or fast (raw series)
+    method: str = "ols",  # fast mode only: ols or theilsen
+    resample_freq: Optional[str] = None,
+    resample_agg: str = "sum",
+    max_points: Optional[int] = None,
+    start_date: Optional[str] = None,  # only use rows dated within [start_date, end_date]
+    end_date: Optional[str] = None,
+    include_timings: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
     """Get trend analysis for a dataset"""
     db = await get_database()
     data_service = DataService(db)
+    cache_service = CacheService(db)
     
-    dataset = await data_service.get_dataset_by_id(dataset_id, include_data=True)
+    dataset = await data_service.get_dataset_by_id(dataset_id)
     
     if not dataset:
         raise HTTPException(
@@ -127,28 +517,82 @@ async def get_trends(
             detail="Not authorized"
         )
     
-    predictor = TimeSeriesPredictor()
-    predictor.prepare_data(dataset.get("data", []), date_column, value_column)
+    missing_columns = [column for column in (date_column, value_column) if column not in dataset.get("columns", [])]
+    if missing_columns:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Columns not found in dataset: {', '.join(missing_columns)}"
+        )
     
-    trend_data = predictor.detect_trend()
+    _validate_trend_options(mode, method)
+    _validate_resampling(resample_freq, resample_agg)
+    resampling = _resampling_options(resample_freq, resample_agg, max_points)
+    date_range = _date_range(start_date, end_date)
     
-    return {
+    profiler = StageProfiler()
+    with profiler.stage("cache_lookup"):
+        cache_key = CacheService.build_key(
+            await data_service.ensure_content_hash(dataset),
+            "trends",
+            dateColumn=date_column,
+            valueColumn=value_column,
+            mode=mode,
+            method=method if mode == "fast" else None,
+            **resampling,
+            **date_range
+        )
+        cached = await cache_service.get(cache_key)
+    if cached:
+        return _attach_timings({**cached, "cached": True}, "trends", profiler, include=include_timings)
+    
+    with profiler.stage("load_data"):
+        data = await data_service.get_series_data(dataset, date_column, value_column, **date_range)
+    
+    try:
+        with profiler.stage("compute"):
+            trend_data = await predictor_executor.run(
+                run_trend, data, date_column, value_column, mode, method,
+                {**resampling, "profile_memory": include_timings, "date_format": schema_date_format(dataset, date_column)}
+            )
+    except PredictionTimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e)
+        )
+    worker_timings = trend_data.pop("timings", None)
+    
+    response = {
         "success": True,
         "trend": trend_data
     }
+    with profiler.stage("save"):
+        await cache_service.set(cache_key, dataset_id, response)
+    
+    return _attach_timings(response, "trends", profiler, worker_timings, include_timings)
 
 @router.get("/seasonality/{dataset_id}", response_model=dict)
 async def get_seasonality(
     dataset_id: str,
     date_column: str,
     value_column: str,
+    resample_freq: Optional[str] = None,
+    resample_agg: str = "sum",
+    max_points: Optional[int] = None,
+    start_date: Optional[str] = None,  # only use rows dated within [start_date, end_date]
+    end_date: Optional[str] = None,
+    output_format: str = "records",
+    float_precision: Optional[int] = None,
+    max_output_points: Optional[int] = None,
+    encoding: str = "json",
+    include_timings: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
     """Get seasonal decomposition for a dataset"""
     db = await get_database()
     data_service = DataService(db)
+    cache_service = CacheService(db)
     
-    dataset = await data_service.get_dataset_by_id(dataset_id, include_data=True)
+    dataset = await data_service.get_dataset_by_id(dataset_id)
     
     if not dataset:
         raise HTTPException(
@@ -163,12 +607,548 @@ async def get_seasonality(
             detail="Not authorized"
         )
     
-    predictor = TimeSeriesPredictor()
-    predictor.prepare_data(dataset.get("data", []), date_column, value_column)
+    missing_columns = [column for column in (date_column, value_column) if column not in dataset.get("columns", [])]
+    if missing_columns:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Columns not found in dataset: {', '.join(missing_columns)}"
+        )
     
-    seasonal_data = predictor.seasonal_decomposition()
+    _validate_resampling(resample_freq, resample_agg)
+    resampling = _resampling_options(resample_freq, resample_agg, max_points)
+    output = _output_options(output_format, float_precision, max_output_points, encoding)
+    date_range = _date_range(start_date, end_date)
     
-    return {
+    profiler = StageProfiler()
+    with profiler.stage("cache_lookup"):
+        cache_key = CacheService.build_key(
+            await data_service.ensure_content_hash(dataset),
+            "seasonality",
+            dateColumn=date_column,
+            valueColumn=value_column,
+            **resampling,
+            **output,
+            **date_range
+        )
+        cached = await cache_service.get(cache_key)
+    if cached:
+        return _encode_response(
+            _attach_timings({**cached, "cached": True}, "seasonality", profiler, include=include_timings), encoding
+        )
+    
+    with profiler.stage("load_data"):
+        data = await data_service.get_series_data(dataset, date_column, value_column, **date_range)
+    
+    try:
+        with profiler.stage("compute"):
+            seasonal_data = await predictor_executor.run(
+                run_seasonality, data, date_column, value_column,
+                {**resampling, **output, "profile_memory": include_timings, "date_format": schema_date_format(dataset, date_column)}
+            )
+    except PredictionTimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e)
+        )
+    worker_timings = seasonal_data.pop("timings", None)
+    
+    response = {
         "success": True,
         "seasonality": seasonal_data
-    }
\ No newline at end of file
+    }
+    with profiler.stage("save"):
+        await cache_service.set(cache_key, dataset_id, response)
+    
+    return _encode_response(_attach_timings(response, "seasonality", profiler, worker_timings, include_timings), encoding)
+
+@router.get("/anomalies/{dataset_id}", response_model=dict)
+async def get_anomalies(
+    dataset_id: str,
+    date_column: str,
+    value_column: str,
+    source: str = "residual",  # residual (decomposition residuals) or raw (values)
+    window: Optional[int] = None,  # points per rolling window, defaults to two seasonal periods
+    threshold: float = 3.5,  # robust z-score above which a point is flagged
+    max_anomalies: int = 1000,
+    resample_freq: Optional[str] = None,
+    resample_agg: str = "sum",
+    max_points: Optional[int] = None,
+    start_date: Optional[str] = None,  # only use rows dated within [start_date, end_date]
+    end_date: Optional[str] = None,
+    output_format: str = "records",
+    float_precision: Optional[int] = None,
+    encoding: str = "json",
+    include_timings: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """Detect anomalies with a rolling robust z-score (median/MAD)"""
+    from ml.predictor import TimeSeriesPredictor
+    
+    db = await get_database()
+    data_service = DataService(db)
+    cache_service = CacheService(db)
+    
+    dataset = await data_service.get_dataset_by_id(dataset_id)
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    # Check authorization
+    if current_user.get("role") != "admin" and dataset.get("userId") != current_user["user_id"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized"
+        )
+    
+    missing_columns = [column for column in (date_column, value_column) if column not in dataset.get("columns", [])]
+    if missing_columns:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Columns not found in dataset: {', '.join(missing_columns)}"
+        )
+    
+    if source not in TimeSeriesPredictor.ANOMALY_SOURCES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported anomaly source '{source}' (use {', '.join(TimeSeriesPredictor.ANOMALY_SOURCES)})"
+        )
+    
+    if (window is not None and window < 3) or threshold <= 0 or max_anomalies < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="window must be at least 3, threshold and max_anomalies must be positive"
+        )
+    
+    _validate_resampling(resample_freq, resample_agg)
+    resampling = _resampling_options(resample_freq, resample_agg, max_points)
+    output = _output_options(output_format, float_precision, None, encoding)
+    date_range = _date_range(start_date, end_date)
+    
+    profiler = StageProfiler()
+    with profiler.stage("cache_lookup"):
+        cache_key = CacheService.build_key(
+            await data_service.ensure_content_hash(dataset),
+            "anomalies",
+            dateColumn=date_column,
+            valueColumn=value_column,
+            source=source,
+            window=window,
+            threshold=threshold,
+            maxAnomalies=max_anomalies,
+            **resampling,
+            **output,
+            **date_range
+        )
+        cached = await cache_service.get(cache_key)
+    if cached:
+        return _encode_response(
+            _attach_timings({**cached, "cached": True}, "anomalies", profiler, include=include_timings), encoding
+        )
+    
+    with profiler.stage("load_data"):
+        data = await data_service.get_series_data(dataset, date_column, value_column, **date_range)
+    
+    try:
+        with profiler.stage("compute"):
+            anomaly_result = await predictor_executor.run(
+                run_anomalies, data, date_column, value_column, source, window, threshold, max_anomalies,
+                {**resampling, **output, "profile_memory": include_timings, "date_format": schema_date_format(dataset, date_column)}
+            )
+    except PredictionTimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e)
+        )
+    worker_timings = anomaly_result.pop("timings", None)
+    
+    if not anomaly_result.get("success"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=anomaly_result.get("error", "Anomaly detection failed")
+        )
+    
+    response = {
+        "success": True,
+        "anomalies": anomaly_result
+    }
+    with profiler.stage("save"):
+        await cache_service.set(cache_key, dataset_id, response)
+    
+    return _encode_response(_attach_timings(response, "anomalies", profiler, worker_timings, include_timings), encoding)
+
+@router.post("/backtest", response_model=dict)
+async def backtest_model(
+    request: BacktestRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Measure forecast accuracy with rolling-origin cross-validation"""
+    db = await get_database()
+    data_service = DataService(db)
+    cache_service = CacheService(db)
+    
+    dataset = await data_service.get_dataset_by_id(request.datasetId)
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    # Check authorization
+    if current_user.get("role") != "admin" and dataset.get("userId") != current_user["user_id"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this dataset"
+        )
+    
+    missing_columns = [column for column in (request.dateColumn, request.valueColumn) if column not in dataset.get("columns", [])]
+    if missing_columns:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Columns not found in dataset: {', '.join(missing_columns)}"
+        )
+    
+    if request.horizon < 1 or request.folds < 1 or (request.step is not None and request.step < 1):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="horizon, folds and step must be positive"
+        )
+    
+    _validate_resampling(request.resampleFreq, request.resampleAgg)
+    resampling = _resampling_options(request.resampleFreq, request.resampleAgg, request.maxPoints)
+    date_range = _date_range(request.startDate, request.endDate)
+    
+    profiler = StageProfiler()
+    with profiler.stage("cache_lookup"):
+        cache_key = CacheService.build_key(
+            await data_service.ensure_content_hash(dataset),
+            "backtest",
+            dateColumn=request.dateColumn,
+            valueColumn=request.valueColumn,
+            horizon=request.horizon,
+            folds=request.folds,
+            step=request.step,
+            orderSearch=request.orderSearch,
+            searchBudget=request.searchBudget if request.orderSearch else None,
+            **resampling,
+            **date_range
+        )
+        cached = await cache_service.get(cache_key)
+    if cached:
+        return _attach_timings({**cached, "cached": True}, "backtest", profiler, include=request.includeTimings)
+    
+    with profiler.stage("load_data"):
+        data = await data_service.get_series_data(dataset, request.dateColumn, request.valueColumn, **date_range)
+    
+    try:
+        with profiler.stage("compute"):
+            backtest_result = await backtest(
+                data,
+                request.dateColumn,
+                request.valueColumn,
+                request.horizon,
+                request.folds,
+                request.step,
+                {
+                    "order_search": request.orderSearch,
+                    "search_budget": request.searchBudget,
+                    "profile_memory": request.includeTimings,
+                    "date_format": schema_date_format(dataset, request.dateColumn),
+                    **resampling
+                }
+            )
+    except PredictionTimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e)
+        )
+    worker_timings = backtest_result.pop("timings", None)
+    
+    if not backtest_result.get("success"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=backtest_result.get("error", "Backtest failed")
+        )
+    
+    response = {
+        "success": True,
+        "backtest": backtest_result
+    }
+    with profiler.stage("save"):
+        await cache_service.set(cache_key, request.datasetId, response)
+    
+    return _attach_timings(response, "backtest", profiler, worker_timings, request.includeTimings)
+
+@router.post("/hierarchical", response_model=dict)
+async def hierarchical_forecast(
+    request: HierarchicalPredictionRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Forecast every node of a dimension hierarchy with reconciled, coherent totals"""
+    from ml.hierarchy import RECONCILIATION_METHODS
+    
+    db = await get_database()
+    data_service = DataService(db)
+    cache_service = CacheService(db)
+    
+    dataset = await data_service.get_dataset_by_id(request.datasetId)
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    # Check authorization
+    if current_user.get("role") != "admin" and dataset.get("userId") != current_user["user_id"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this dataset"
+        )
+    
+    if not request.levels or len(set(request.levels)) != len(request.levels):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="levels must be a non-empty list of distinct columns"
+        )
+    
+    missing_columns = [
+        column for column in (request.dateColumn, request.valueColumn, *request.levels)
+        if column not in dataset.get("columns", [])
+    ]
+    if missing_columns:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Columns not found in dataset: {', '.join(missing_columns)}"
+        )
+    
+    if request.reconciliation not in RECONCILIATION_METHODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported reconciliation method '{request.reconciliation}' (use {', '.join(RECONCILIATION_METHODS)})"
+        )
+    
+    _validate_resampling(request.resampleFreq, request.resampleAgg)
+    resampling = _resampling_options(request.resampleFreq, request.resampleAgg, request.maxPoints)
+    output = _output_options(request.outputFormat, request.floatPrecision, None, request.encoding)
+    model = _model_options(request.modelType, request.latencyBudget)
+    date_range = _date_range(request.startDate, request.endDate)
+    
+    profiler = StageProfiler()
+    with profiler.stage("cache_lookup"):
+        cache_key = CacheService.build_key(
+            await data_service.ensure_content_hash(dataset),
+            "hierarchical",
+            dateColumn=request.dateColumn,
+            valueColumn=request.valueColumn,
+            levels=request.levels,
+            forecastPeriods=request.forecastPeriods,
+            reconciliation=request.reconciliation,
+            **model,
+            **resampling,
+            **output,
+            **date_range
+        )
+        cached = await cache_service.get(cache_key)
+    if cached:
+        return _encode_response(
+            _attach_timings({**cached, "cached": True}, "hierarchical", profiler, include=request.includeTimings),
+            request.encoding
+        )
+    
+    with profiler.stage("load_data"):
+        data = await data_service.get_dataset_data(
+            request.datasetId, [request.dateColumn, request.valueColumn, *request.levels],
+            date_column=request.dateColumn, **date_range
+        )
+    
+    try:
+        with profiler.stage("compute"):
+            hierarchy_result = await forecast_hierarchy(
+                data,
+                request.dateColumn,
+                request.valueColumn,
+                request.levels,
+                request.forecastPeriods,
+                request.reconciliation,
+                {
+                    **model,
+                    **resampling,
+                    **output,
+                    "profile_memory": request.includeTimings,
+                    "date_format": schema_date_format(dataset, request.dateColumn)
+                }
+            )
+    except PredictionTimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e)
+        )
+    worker_timings = hierarchy_result.pop("timings", None)
+    
+    if not hierarchy_result.get("success"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=hierarchy_result.get("error", "Hierarchical forecast failed")
+        )
+    
+    response = {
+        "success": True,
+        "hierarchy": hierarchy_result
+    }
+    with profiler.stage("save"):
+        await cache_service.set(cache_key, request.datasetId, response)
+    
+    return _encode_response(
+        _attach_timings(response, "hierarchical", profiler, worker_timings, request.includeTimings), request.encoding
+    )
+
+@router.post("/batch")
+async def batch_forecast(
+    request: BatchPredictionRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Forecast many series of a dataset in parallel, streaming results as NDJSON"""
+    from ml.predictor import build_series
+    
+    db = await get_database()
+    data_service = DataService(db)
+    
+    dataset = await data_service.get_dataset_by_id(request.datasetId)
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    # Check authorization
+    if current_user.get("role") != "admin" and dataset.get("userId") != current_user["user_id"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this dataset"
+        )
+    
+    # Validate columns
+    if request.groupBy:
+        if not request.valueColumn:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="valueColumn is required when grouping by a column"
+            )
+        required_columns = [request.dateColumn, request.groupBy, request.valueColumn]
+        value_columns = None
+    else:
+        value_columns = request.valueColumns or dataset.get("valueColumns", [])
+        if not value_columns:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No value columns to forecast"
+            )
+        required_columns = [request.dateColumn, *value_columns]
+    
+    missing_columns = [column for column in required_columns if column not in dataset.get("columns", [])]
+    if missing_columns:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Columns not found in dataset: {', '.join(missing_columns)}"
+        )
+    
+    _validate_resampling(request.resampleFreq, request.resampleAgg)
+    resampling = _resampling_options(request.resampleFreq, request.resampleAgg, request.maxPoints)
+    output = _output_options(request.outputFormat, request.floatPrecision, request.maxOutputPoints)
+    model = _model_options(request.modelType, request.latencyBudget)
+    date_range = _date_range(request.startDate, request.endDate)
+    
+    # Parse the frame once and split it into series off the event loop
+    profiler = StageProfiler()
+    with profiler.stage("load_data"):
+        data = await data_service.get_dataset_data(
+            request.datasetId, list(dict.fromkeys(required_columns)), date_column=request.dateColumn, **date_range
+        )
+    with profiler.stage("build_series"):
+        series_map = await asyncio.to_thread(
+            build_series, data, request.dateColumn, value_columns, request.groupBy, request.valueColumn,
+            schema_date_format(dataset, request.dateColumn)
+        )
+    del data
+    with profiler.stage("load_model_states"):
+        model_states = await data_service.get_model_states(
+            request.datasetId, request.dateColumn, request.groupBy,
+            value_column=request.valueColumn if request.groupBy else None,
+            series_settings=_series_settings(resampling, date_range)
+        )
+    preparation = _attach_timings({}, "batch", profiler, include=request.includeTimings)
+    
+    async def forecast_one(key, series):
+        series_profiler = StageProfiler()
+        try:
+            with series_profiler.stage("compute"):
+                result = await predictor_executor.run(
+                    run_forecast,
+                    series,
+                    request.forecastPeriods,
+                    {
+                        "order_search": request.orderSearch,
+                        "search_budget": request.searchBudget,
+                        "warm_start": model_states.get(key),
+                        "profile_memory": request.includeTimings,
+                        **model,
+                        **resampling,
+                        **output
+                    }
+                )
+        except PredictionTimeoutError as e:
+            result = {"success": False, "error": str(e)}
+        except Exception as e:
+            # One failing series (e.g. a broken worker pool) must not end the stream
+            result = {"success": False, "error": f"Forecast failed: {str(e)}"}
+        worker_timings = result.pop("timings", None)
+        
+        if result.get("success"):
+            try:
+                with series_profiler.stage("save"):
+                    await data_service.save_prediction({
+                        "datasetId": request.datasetId,
+                        "userId": current_user["user_id"],
+                        "modelType": result.get("modelType", request.modelType),
+                        "predictions": result.get("forecast", []),
+                        "metrics": result.get("metrics", {}),
+                        "modelState": result.get("modelState"),
+                        "parameters": {
+                            "dateColumn": request.dateColumn,
+                            "valueColumn": request.valueColumn or key,
+                            "groupBy": request.groupBy,
+                            "seriesKey": key,
+                            "seriesSettings": _series_settings(resampling, date_range),
+                            "forecastPeriods": request.forecastPeriods,
+                            "order": result.get("parameters", {}).get("order"),
+                            "outputFormat": request.outputFormat
+                        }
+                    })
+            except Exception as e:
+                result = {"success": False, "error": f"Failed to save prediction: {str(e)}"}
+        
+        return key, _attach_timings(result, "batch", series_profiler, worker_timings, request.includeTimings)
+    
+    async def stream_results():
+        tasks = [asyncio.create_task(forecast_one(key, series)) for key, series in series_map.items()]
+        series_map.clear()
+        completed = 0
+        
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                key, result = await next_result
+                completed += 1
+                yield json.dumps({"series": key, **result}) + "\n"
+            
+            yield json.dumps({"type": "summary", "totalSeries": len(tasks), "completed": completed, **preparation}) + "\n"
+        finally:
+            # Client went away: drop the jobs that have not run yet
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
@@ -0,0 +1,173 @@
+from typing import Optional, Dict, Any, Tuple
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import bson
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """In-memory LRU cache with per-entry TTL"""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a value, refreshing its recency"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key: str, dataset_id: str, value: Any):
+        """Store a value, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, dataset_id, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_dataset(self, dataset_id: str) -> int:
+        """Drop every entry belonging to a dataset"""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry[1] == dataset_id]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Process-wide memory tier shared by all CacheService instances
+memory_cache = LRUCache(
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=int(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
+)
+
+
+class CacheService:
+    """Content-addressed cache for forecasts and analyses.
+
+    Entries are keyed on the dataset content hash plus the analysis parameters,
+    so a changed dataset never serves stale results. Lookups go to the in-memory
+    LRU tier first and fall back to the persistent Mongo tier.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.cache_collection = db.prediction_cache
+        self.max_persistent_entries = int(os.getenv("RESULT_CACHE_MAX_PERSISTENT_ENTRIES", "5000"))
+        self.persistent_ttl_seconds = int(os.getenv("RESULT_CACHE_PERSISTENT_TTL_SECONDS", "86400"))
+        # Larger results stay in the memory tier only (Mongo documents are capped at 16 MB)
+        self.max_persistent_bytes = int(os.getenv("RESULT_CACHE_MAX_PERSISTENT_BYTES", str(8 * 1024 * 1024)))
+
+    @staticmethod
+    def build_key(content_hash: str, analysis_type: str, **params) -> str:
+        """Build a cache key from the dataset content hash and analysis parameters"""
+        payload = json.dumps(
+            {"contentHash": content_hash, "analysisType": analysis_type, "params": params},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached result"""
+        result = memory_cache.get(key)
+        if result is not None:
+            return result
+
+        entry = await self.cache_collection.find_one({"key": key, "expiresAt": {"$gt": datetime.utcnow()}})
+        if not entry:
+            return None
+
+        memory_cache.set(key, entry["datasetId"], entry["result"])
+        return entry["result"]
+
+    async def set(self, key: str, dataset_id: str, result: Dict[str, Any]):
+        """Store a result in both tiers.
+
+        Results too large for the persistent tier are kept in memory only.
+        A failed cache write is logged and never fails the caller.
+        """
+        memory_cache.set(key, dataset_id, result)
+
+        try:
+            # Encoding a large result is CPU-bound: keep it off the event loop
+            size = len(await asyncio.to_thread(bson.encode, {"result": result}))
+            if size > self.max_persistent_bytes:
+                logger.info(f"Result cache entry {key[:12]} is {size} bytes; not persisted")
+                return
+
+            now = datetime.utcnow()
+            await self.cache_collection.update_one(
+                {"key": key},
+                {"$set": {
+                    "key": key,
+                    "datasetId": dataset_id,
+                    "result": result,
+                    "createdAt": now,
+                    "expiresAt": now + timedelta(seconds=self.persistent_ttl_seconds)
+                }},
+                upsert=True
+            )
+            await self._trim()
+        except Exception as e:
+            logger.warning(f"Failed to persist result cache entry {key[:12]}: {e}")
+
+    async def invalidate_dataset(self, dataset_id: str) -> int:
+        """Drop all cached results for a dataset"""
+        removed = memory_cache.invalidate_dataset(dataset_id)
+        result = await self.cache_collection.delete_many({"datasetId": dataset_id})
+        return removed + result.deleted_count
+
+    async def _trim(self):
+        """Evict the oldest persistent entries beyond the size limit"""
+        total = await self.cache_collection.estimated_document_count()
+        excess = total - self.max_persistent_entries
+        if excess <= 0:
+            return
+
+        oldest = await self.cache_collection.find({}, {"_id": 1}).sort("createdAt", 1).limit(excess).to_list(excess)
+        if oldest:
+            await self.cache_collection.delete_many({"_id": {"$in": [entry["_id"] for entry in oldest]}})
+
+    async def get_stats(self) -> Dict[str, Any]:
+        return {
+            "memory": memory_cache.get_stats(),
+            "persistent": {
+                "entries": await self.cache_collection.estimated_document_count(),
+                "maxEntries": self.max_persistent_entries,
+                "ttlSeconds": self.persistent_ttl_seconds
+            }
+        }
@@ -1,71 +1,125 @@
-from typing import Optional, Dict, Any, List
-from datetime import datetime
+from typing import Optional, Dict, Any, List, AsyncIterator, BinaryIO, Iterator, TYPE_CHECKING
+from datetime import datetime, timedelta
+import asyncio
+import itertools
 import uuid
-import pandas as pd
+import hashlib
 import io
+import os
+import shutil
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.cache_service import CacheService
+from services.schema_inference import schema_date_format
+
+# pandas is imported where it is used so the API process starts without it
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# Rows per chunk document. Rows are stored in a separate collection as column
+# arrays, so datasets are not bound by the 16 MB document limit.
+CHUNK_ROWS = int(os.getenv("DATASET_CHUNK_ROWS", "10000"))
+
+# Local directory holding the columnar copy of each dataset's numeric and date
+# columns, which the predictor memory-maps instead of rebuilding rows
+STORE_DIR = os.getenv("DATASET_STORE_DIR", "storage/datasets")
+
+# An append claims its dataset for at most this long, so a crashed one does not block others forever
+APPEND_CLAIM_TIMEOUT = timedelta(seconds=int(os.getenv("DATASET_APPEND_TIMEOUT", "3600")))
+
+# Dataset fields returned by reads: not the rows embedded in datasets stored
+# before chunking, nor the internal statistics state used by appends
+DATASET_PROJECTION = {"data": 0, "statisticsState": 0}
 
 class DataService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.datasets_collection = db.datasets
         self.predictions_collection = db.predictions
+        self.chunks_collection = db.dataset_chunks
+        self.cache_service = CacheService(db)
     
-    async def upload_dataset(self, file_content: bytes, filename: str, user_id: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Upload and process a dataset"""
+    async def upload_dataset(self, file: BinaryIO, filename: str, user_id: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Upload and process a dataset.
+        
+        The file is parsed CHUNK_ROWS rows at a time in a worker thread; each
+        chunk is stored and folded into the statistics before the next one is
+        read, so memory is bounded by the chunk size rather than the file size
+        (Excel files, which cannot be read incrementally, are parsed whole).
+        """
+        from services.dataset_ingest import DatasetIngest
+        from services.schema_inference import infer_schema
+        
+        if not filename.endswith(('.csv', '.xlsx', '.xls')):
+            return {"success": False, "error": "Unsupported file format. Please upload CSV or Excel files."}
+        if isinstance(file, bytes):
+            file = io.BytesIO(file)
+        
+        dataset_id = str(uuid.uuid4())
+        ingest = None
         try:
-            # Read CSV/Excel file
-            if filename.endswith('.csv'):
-                df = pd.read_csv(io.BytesIO(file_content))
-            elif filename.endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(io.BytesIO(file_content))
-            else:
-                return {"success": False, "error": "Unsupported file format. Please upload CSV or Excel files."}
+            frames = self._read_frames(file, filename)
+            first = await asyncio.to_thread(next, frames, None)
             
             # Basic validation
-            if df.empty:
+            if first is None or first.empty:
                 return {"success": False, "error": "Dataset is empty"}
             
-            # Detect date column
-            date_column = self._detect_date_column(df)
+            # Infer column types and the date column from a sample of the first chunk
+            schema, date_column = await asyncio.to_thread(infer_schema, first)
             
-            # Detect value columns (numeric columns)
-            value_columns = df.select_dtypes(include=['number']).columns.tolist()
+            ingest = DatasetIngest(
+                dataset_id, itertools.chain([first], frames), schema, date_column, os.path.join(STORE_DIR, dataset_id)
+            )
+            
+            # Store the rows first so the dataset never becomes visible without them.
+            # The next chunk is parsed while the current one is being inserted.
+            pending = asyncio.ensure_future(asyncio.to_thread(ingest.next_chunk))
+            try:
+                while True:
+                    chunk = await pending
+                    if chunk is None:
+                        break
+                    pending = asyncio.ensure_future(asyncio.to_thread(ingest.next_chunk))
+                    await self.chunks_collection.insert_one(chunk)
+            finally:
+                # A worker thread cannot be interrupted: let it finish before cleaning up
+                if not pending.done():
+                    await asyncio.gather(pending, return_exceptions=True)
+            summary = await asyncio.to_thread(ingest.finish)
             
             # Create dataset document
-            dataset_id = str(uuid.uuid4())
             dataset_doc = {
                 "id": dataset_id,
                 "userId": user_id,
                 "filename": filename,
                 "uploadedAt": datetime.utcnow(),
-                "rowCount": len(df),
-                "columnCount": len(df.columns),
-                "columns": df.columns.tolist(),
+                "rowCount": summary["rowCount"],
+                "columnCount": summary["columnCount"],
+                "columns": summary["columns"],
+                "schema": summary["schema"],
                 "dateColumn": date_column,
-                "valueColumns": value_columns,
+                "valueColumns": summary["valueColumns"],
                 "metadata": metadata or {},
                 "status": "processed",
-                "dataPreview": df.head(10).to_dict('records'),
-                "statistics": {
-                    "mean": df[value_columns].mean().to_dict() if value_columns else {},
-                    "median": df[value_columns].median().to_dict() if value_columns else {},
-                    "std": df[value_columns].std().to_dict() if value_columns else {},
-                    "min": df[value_columns].min().to_dict() if value_columns else {},
-                    "max": df[value_columns].max().to_dict() if value_columns else {},
-                }
+                "storage": {
+                    "layout": "chunked",
+                    "chunkRows": CHUNK_ROWS,
+                    "chunkCount": summary["chunkCount"],
+                    "columnar": summary["columnar"]
+                },
+                "contentHash": summary["contentHash"],
+                "dataPreview": summary["dataPreview"],
+                "statistics": summary["statistics"],
+                "statisticsState": summary["statisticsState"]
             }
             
-            # Store full data as records
-            dataset_doc["data"] = df.to_dict('records')
-            
             # Insert dataset
             result = await self.datasets_collection.insert_one(dataset_doc)
             
             if result.inserted_id:
                 dataset_doc["_id"] = str(result.inserted_id)
-                # Remove full data from response (too large)
-                dataset_doc.pop("data", None)
+                del dataset_doc["statisticsState"]
                 
                 return {
                     "success": True,
@@ -73,34 +127,198 @@ class DataService:
                     "message": "Dataset uploaded and processed successfully"
                 }
             else:
+                await self._remove_stored_rows(dataset_id)
                 return {"success": False, "error": "Failed to save dataset"}
                 
         except Exception as e:
+            if ingest is not None:
+                await asyncio.to_thread(ingest.abort)
+            await self._remove_stored_rows(dataset_id)
             return {"success": False, "error": f"Error processing dataset: {str(e)}"}
     
-    def _detect_date_column(self, df: pd.DataFrame) -> Optional[str]:
-        """Detect the date column in a dataframe"""
-        # Common date column names
-        date_keywords = ['date', 'time', 'timestamp', 'datetime', 'period', 'month', 'year', 'day']
-        
-        for col in df.columns:
-            col_lower = col.lower()
-            if any(keyword in col_lower for keyword in date_keywords):
-                try:
-                    pd.to_datetime(df[col])
-                    return col
-                except:
-                    continue
+    async def append_rows(self, dataset_id: str, file: BinaryIO, filename: str) -> Dict[str, Any]:
+        """Append the rows of a CSV or Excel file to a stored dataset.
+        
+        The file must have the dataset's columns (in any order). The new rows
+        are stored as new chunks and appended to the columnar copy, and the
+        statistics are updated by merging the new rows' moments and quantile
+        digests into the persisted ones, so the cost is O(new rows).
+        """
+        from services.dataset_ingest import DatasetIngest
         
-        # Try to detect by parsing
-        for col in df.columns:
+        if not filename.endswith(('.csv', '.xlsx', '.xls')):
+            return {"success": False, "error": "Unsupported file format. Please upload CSV or Excel files."}
+        if isinstance(file, bytes):
+            file = io.BytesIO(file)
+        
+        # One append at a time per dataset; a claim left by a crashed process expires
+        started = datetime.utcnow()
+        dataset = await self.datasets_collection.find_one_and_update(
+            {
+                "id": dataset_id,
+                "$or": [{"status": {"$ne": "appending"}}, {"appendStartedAt": {"$lt": started - APPEND_CLAIM_TIMEOUT}}]
+            },
+            {"$set": {"status": "appending", "appendStartedAt": started}},
+            {"data": 0}
+        )
+        if not dataset:
+            exists = await self.datasets_collection.count_documents({"id": dataset_id})
+            return {"success": False, "error": "Dataset is being appended to" if exists else "Dataset not found"}
+        
+        ingest = None
+        inserted = False
+        try:
+            if not dataset.get("storage"):
+                return {"success": False, "error": "Datasets stored before chunking cannot be appended to; upload it again"}
+            await self.ensure_content_hash(dataset)
+            if "statisticsState" not in dataset:
+                dataset["statisticsState"] = await self._column_states(dataset)
+            
+            columns = dataset["columns"]
+            frames = self._read_frames(file, filename, dataset["storage"]["chunkRows"])
+            first = await asyncio.to_thread(next, frames, None)
+            if first is None or first.empty:
+                return {"success": False, "error": "No rows to append"}
+            if sorted(map(str, first.columns)) != sorted(map(str, columns)):
+                return {"success": False, "error": f"Columns do not match the dataset's: {', '.join(map(str, columns))}"}
+            
+            ingest = DatasetIngest(
+                dataset_id, (df[columns] for df in itertools.chain([first], frames)), dataset.get("schema") or [],
+                dataset.get("dateColumn"), os.path.join(STORE_DIR, dataset_id), dataset=dataset
+            )
+            
+            pending = asyncio.ensure_future(asyncio.to_thread(ingest.next_chunk))
             try:
-                pd.to_datetime(df[col])
-                return col
-            except:
-                continue
+                while True:
+                    chunk = await pending
+                    if chunk is None:
+                        break
+                    pending = asyncio.ensure_future(asyncio.to_thread(ingest.next_chunk))
+                    inserted = True
+                    await self.chunks_collection.insert_one(chunk)
+            finally:
+                if not pending.done():
+                    await asyncio.gather(pending, return_exceptions=True)
+            summary = await asyncio.to_thread(ingest.finish)
+            
+            update = {
+                "rowCount": summary["rowCount"],
+                "schema": summary["schema"],
+                "valueColumns": summary["valueColumns"],
+                "storage.chunkCount": summary["chunkCount"],
+                "storage.columnar": summary["columnar"],
+                "contentHash": summary["contentHash"],
+                "statistics": summary["statistics"],
+                "statisticsState": summary["statisticsState"],
+                "status": "processed",
+                "updatedAt": datetime.utcnow()
+            }
+            await self.datasets_collection.update_one({"id": dataset_id}, {"$set": update, "$unset": {"appendStartedAt": ""}})
         
-        return None
+        except Exception as e:
+            if ingest is not None:
+                await asyncio.to_thread(ingest.abort)
+            if inserted:
+                await self.chunks_collection.delete_many(
+                    {"datasetId": dataset_id, "chunk": {"$gte": dataset["storage"]["chunkCount"]}}
+                )
+            return {"success": False, "error": f"Error appending rows: {str(e)}"}
+        finally:
+            # Releases the claim unless the update above already did
+            await self.datasets_collection.update_one(
+                {"id": dataset_id, "status": "appending", "appendStartedAt": started},
+                {"$set": {"status": "processed"}, "$unset": {"appendStartedAt": ""}}
+            )
+        
+        # Results are keyed by content hash, so the old ones can no longer be hit
+        await self.cache_service.invalidate_dataset(dataset_id)
+        return {
+            "success": True,
+            "dataset": await self.get_dataset_by_id(dataset_id),
+            "appendedRows": summary["rowCount"] - dataset["rowCount"],
+            "message": "Rows appended successfully"
+        }
+    
+    async def get_percentiles(self, dataset: Dict[str, Any], percentiles: List[float],
+                              columns: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+        """Estimate percentiles (0-100) of value columns from their stored quantile digests.
+        
+        No rows are read, except once for datasets stored before the digests
+        were kept, whose state is then built and saved.
+        """
+        from services.dataset_ingest import ColumnState
+        
+        stored = await self.datasets_collection.find_one({"id": dataset["id"]}, {"statisticsState": 1, "rowCount": 1})
+        states = (stored or {}).get("statisticsState")
+        if states is None:
+            states = await self._column_states(dataset)
+            # Unless an append got there first
+            await self.datasets_collection.update_one(
+                {"id": dataset["id"], "rowCount": (stored or {}).get("rowCount"), "statisticsState": {"$exists": False}},
+                {"$set": {"statisticsState": states}}
+            )
+        
+        result = {}
+        for name in columns or dataset.get("valueColumns", []):
+            digest = ColumnState.from_dict(states[name]).digest
+            result[name] = {f"p{percentile:g}": digest.quantile(percentile / 100) for percentile in percentiles}
+        return result
+    
+    async def _column_states(self, dataset: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Build the persisted statistics state of a dataset stored before it was kept, from its rows"""
+        import pandas as pd
+        from services.dataset_ingest import ColumnState
+        
+        value_columns = dataset.get("valueColumns", [])
+        states = {name: ColumnState() for name in value_columns}
+        
+        def update(part: Dict[str, List[Any]]):
+            for name in value_columns:
+                states[name].update(pd.to_numeric(pd.Series(part[name], dtype=object), errors="coerce").to_numpy(dtype=float))
+        
+        if value_columns:
+            async for part in self.iter_dataset_chunks(dataset["id"], value_columns):
+                await asyncio.to_thread(update, part)
+        return {name: state.to_dict() for name, state in states.items()}
+    
+    def _read_frames(self, file: BinaryIO, filename: str, chunk_rows: int = CHUNK_ROWS) -> Iterator["pd.DataFrame"]:
+        """Read a CSV or Excel file as dataframes of chunk_rows rows (the last may be shorter)"""
+        import pandas as pd
+        
+        if filename.endswith('.csv'):
+            with pd.read_csv(file, chunksize=chunk_rows) as reader:
+                yield from reader
+        else:
+            df = pd.read_excel(file)
+            for start in range(0, len(df), chunk_rows):
+                yield df.iloc[start:start + chunk_rows]
+    
+    async def _remove_stored_rows(self, dataset_id: str):
+        """Delete the row chunks and the columnar copy of a dataset"""
+        await self.chunks_collection.delete_many({"datasetId": dataset_id})
+        shutil.rmtree(os.path.join(STORE_DIR, dataset_id), ignore_errors=True)
+    
+    def _compute_content_hash(self, df: "pd.DataFrame") -> str:
+        """Compute a stable hash of the dataset content"""
+        import pandas as pd
+        
+        hasher = hashlib.sha256()
+        hasher.update(",".join(map(str, df.columns)).encode("utf-8"))
+        hasher.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        return hasher.hexdigest()
+    
+    async def ensure_content_hash(self, dataset: Dict[str, Any]) -> str:
+        """Get the content hash of a dataset, backfilling it for datasets stored before hashing existed"""
+        if dataset.get("contentHash"):
+            return dataset["contentHash"]
+        
+        import pandas as pd
+        
+        data = await self.get_dataset_data(dataset["id"])
+        content_hash = self._compute_content_hash(pd.DataFrame(data))
+        await self.datasets_collection.update_one({"id": dataset["id"]}, {"$set": {"contentHash": content_hash}})
+        dataset["contentHash"] = content_hash
+        return content_hash
     
     async def get_datasets(self, user_id: Optional[str] = None, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
         """Get datasets for a user or all datasets (admin)"""
@@ -108,12 +326,12 @@ class DataService:
         if user_id:
             query["userId"] = user_id
         
-        datasets = await self.datasets_collection.find(query).skip(offset).limit(limit).to_list(limit)
+        # Datasets stored before chunking embed their rows; never load them for a listing
+        datasets = await self.datasets_collection.find(query, DATASET_PROJECTION).skip(offset).limit(limit).to_list(limit)
         
-        # Convert ObjectId to string and remove full data
+        # Convert ObjectId to string
         for dataset in datasets:
             dataset["_id"] = str(dataset["_id"])
-            dataset.pop("data", None)  # Don't send full data in list
         
         total = await self.datasets_collection.count_documents(query)
         
@@ -127,15 +345,130 @@ class DataService:
     
     async def get_dataset_by_id(self, dataset_id: str, include_data: bool = False) -> Optional[Dict[str, Any]]:
         """Get a specific dataset by ID"""
-        dataset = await self.datasets_collection.find_one({"id": dataset_id})
+        dataset = await self.datasets_collection.find_one({"id": dataset_id}, DATASET_PROJECTION)
         
         if dataset:
             dataset["_id"] = str(dataset["_id"])
-            if not include_data:
-                dataset.pop("data", None)
+            if include_data:
+                dataset["data"] = await self.get_dataset_data(dataset_id)
         
         return dataset
     
+    async def iter_dataset_chunks(self, dataset_id: str, columns: Optional[List[str]] = None, start: int = 0,
+                                  stop: Optional[int] = None, date_column: Optional[str] = None,
+                                  start_date: Optional[str] = None,
+                                  end_date: Optional[str] = None) -> AsyncIterator[Dict[str, List[Any]]]:
+        """Stream rows [start, stop) of a dataset as column arrays, one chunk at a time.
+        
+        Only the chunks overlapping the range are read, and only the requested
+        columns leave the server. With start_date/end_date, rows whose
+        date_column value falls outside [start_date, end_date] (or does not
+        parse as a date) are dropped. Raises KeyError for unknown columns.
+        Rows past the dataset's committed rowCount are never read.
+        """
+        dataset = await self.datasets_collection.find_one(
+            {"id": dataset_id}, {"columns": 1, "storage": 1, "schema": 1, "rowCount": 1}
+        )
+        if dataset and dataset.get("rowCount") is not None:
+            # Chunks beyond it belong to an append still in progress, or to a
+            # failed one about to be deleted, and the content hash covers neither
+            stop = dataset["rowCount"] if stop is None else min(stop, dataset["rowCount"])
+        if not dataset or (stop is not None and stop <= start):
+            return
+        
+        names = dataset.get("columns", [])
+        selected = columns or names
+        filtering = bool(start_date or end_date)
+        # The date column is read for filtering even when it is not requested
+        fetched = selected + [date_column] if filtering and date_column not in selected else selected
+        unknown = [column for column in fetched if column not in names]
+        if unknown:
+            raise KeyError(f"Columns not found in dataset: {', '.join(map(str, unknown))}")
+        positions = [names.index(column) for column in fetched]
+        date_format = schema_date_format(dataset, date_column) if filtering else None
+        
+        async for part in self._iter_stored_parts(dataset_id, dataset.get("storage"), fetched, positions, start, stop):
+            if filtering:
+                # Date parsing is CPU-bound: keep it off the event loop
+                mask = await asyncio.to_thread(_date_range_mask, part[date_column], start_date, end_date, date_format)
+                if not mask.any():
+                    continue
+                part = {column: list(itertools.compress(part[column], mask)) for column in selected}
+            elif fetched is not selected:
+                part = {column: part[column] for column in selected}
+            yield part
+    
+    async def _iter_stored_parts(self, dataset_id: str, storage: Optional[Dict[str, Any]], columns: List[str],
+                                 positions: List[int], start: int, stop: Optional[int]) -> AsyncIterator[Dict[str, List[Any]]]:
+        """Read rows [start, stop) of some columns from the stored chunks"""
+        if not storage:
+            # Stored before chunking: slice the embedded rows on the server
+            window = [start, stop - start] if stop is not None else [start, 2 ** 31 - 1]
+            legacy = await self.datasets_collection.find_one({"id": dataset_id}, {"data": {"$slice": window}, "id": 1})
+            rows = legacy.get("data", []) if legacy else []
+            if rows:
+                yield {column: [row.get(column) for row in rows] for column in columns}
+            return
+        
+        # Chunks hold at most chunkRows rows, but appends leave shorter ones
+        # in between, so the range is found by each chunk's first row
+        row_query: Dict[str, Any] = {"$gt": start - storage["chunkRows"]}
+        if stop is not None:
+            row_query["$lt"] = stop
+        projection = {"_id": 0, "rowStart": 1, "rowCount": 1, **{f"columns.{position}": 1 for position in positions}}
+        
+        cursor = self.chunks_collection.find({"datasetId": dataset_id, "rowStart": row_query}, projection).sort("rowStart", 1)
+        async for chunk in cursor:
+            first = max(start - chunk["rowStart"], 0)
+            last = chunk["rowCount"] if stop is None else min(stop - chunk["rowStart"], chunk["rowCount"])
+            if last > first:
+                yield {
+                    column: chunk["columns"][str(position)][first:last]
+                    for column, position in zip(columns, positions)
+                }
+    
+    async def get_dataset_columns(self, dataset_id: str, columns: Optional[List[str]] = None, start: int = 0,
+                                  stop: Optional[int] = None, date_column: Optional[str] = None,
+                                  start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, List[Any]]:
+        """Get rows [start, stop) of a dataset as column arrays"""
+        result: Dict[str, List[Any]] = {}
+        async for part in self.iter_dataset_chunks(dataset_id, columns, start, stop, date_column, start_date, end_date):
+            for column, values in part.items():
+                result.setdefault(column, []).extend(values)
+        return result
+    
+    async def get_series_data(self, dataset: Dict[str, Any], date_column: str, value_column: str,
+                              start_date: Optional[str] = None, end_date: Optional[str] = None):
+        """Get the date and value columns for a single-series prediction, optionally within a date range.
+        
+        Returns a ColumnarDataset (typed, memory-mapped, cheap to send to
+        predictor workers) when both columns were stored in columnar form on
+        this host, and the rows of just those two columns otherwise.
+        """
+        columnar = (dataset.get("storage") or {}).get("columnar")
+        if columnar and columnar.get("dateColumn") == date_column and value_column in columnar.get("columns", []):
+            from ml.columnar import ColumnarDataset
+            
+            stored = ColumnarDataset.open(os.path.join(STORE_DIR, dataset["id"]))
+            # An append rewrites the copy before it commits the new rowCount
+            if stored is not None and stored.schema["rowCount"] == dataset.get("rowCount"):
+                return stored.select_dates(start_date, end_date) if start_date or end_date else stored
+        # Only the rows the dataset's content hash (and so the result cache key) covers
+        return await self.get_dataset_data(
+            dataset["id"], list(dict.fromkeys([date_column, value_column])), stop=dataset.get("rowCount"),
+            date_column=date_column, start_date=start_date, end_date=end_date
+        )
+    
+    async def get_dataset_data(self, dataset_id: str, columns: Optional[List[str]] = None, start: int = 0,
+                               stop: Optional[int] = None, date_column: Optional[str] = None,
+                               start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get rows [start, stop) of a dataset as records, optionally only some columns and a date range"""
+        rows: List[Dict[str, Any]] = []
+        async for part in self.iter_dataset_chunks(dataset_id, columns, start, stop, date_column, start_date, end_date):
+            names = list(part)
+            rows.extend(dict(zip(names, values)) for values in zip(*part.values()))
+        return rows
+    
     async def delete_dataset(self, dataset_id: str, user_id: Optional[str] = None) -> Dict[str, Any]:
         """Delete a dataset"""
         query = {"id": dataset_id}
@@ -145,8 +478,10 @@ class DataService:
         result = await self.datasets_collection.delete_one(query)
         
         if result.deleted_count > 0:
-            # Also delete associated predictions
+            # Also delete the stored rows, associated predictions and cached results
+            await self._remove_stored_rows(dataset_id)
             await self.predictions_collection.delete_many({"datasetId": dataset_id})
+            await self.cache_service.invalidate_dataset(dataset_id)
             return {"success": True, "message": "Dataset deleted successfully"}
         else:
             return {"success": False, "error": "Dataset not found or unauthorized"}
@@ -165,6 +500,10 @@ class DataService:
             "parameters": prediction_data.get("parameters", {})
         }
         
+        # Fitted model parameters let the next fit on this series warm-start
+        if prediction_data.get("modelState"):
+            prediction_doc["modelState"] = prediction_data["modelState"]
+        
         result = await self.predictions_collection.insert_one(prediction_doc)
         
         if result.inserted_id:
@@ -173,6 +512,43 @@ class DataService:
         else:
             return {"success": False, "error": "Failed to save prediction"}
     
+    async def get_model_states(self, dataset_id: str, date_column: str, group_by: Optional[str] = None,
+                               series_keys: Optional[List[str]] = None, value_column: Optional[str] = None,
+                               series_settings: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+        """Get the most recent fitted model state per series of a dataset.
+        
+        Only states fitted on the same series qualify: the same value column
+        (value_column, or the series key itself for one series per column) and
+        the same series_settings (resampling, point limit, date range), as
+        saved with the prediction.
+        """
+        query = {
+            "datasetId": dataset_id,
+            "parameters.dateColumn": date_column,
+            "parameters.groupBy": group_by,
+            "modelState": {"$exists": True},
+            **{f"parameters.seriesSettings.{name}": value for name, value in (series_settings or {}).items()}
+        }
+        if series_keys is not None:
+            query["parameters.seriesKey"] = {"$in": series_keys}
+        if value_column is not None:
+            query["parameters.valueColumn"] = value_column
+        
+        cursor = self.predictions_collection.find(
+            query,
+            {"parameters.seriesKey": 1, "parameters.valueColumn": 1, "modelState": 1}
+        ).sort("createdAt", -1)
+        
+        states = {}
+        async for prediction in cursor:
+            parameters = prediction.get("parameters", {})
+            key = parameters.get("seriesKey")
+            if key is None or key in states or parameters.get("valueColumn") != (value_column or key):
+                continue
+            states[key] = prediction["modelState"]
+        
+        return states
+    
     async def get_predictions(self, dataset_id: Optional[str] = None, user_id: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
         """Get predictions"""
         query = {}
@@ -190,4 +566,24 @@ class DataService:
             "success": True,
             "predictions": predictions,
             "total": len(predictions)
-        }
\ No newline at end of file
+        }
+
+
+def _date_range_mask(values: List[Any], start_date: Optional[str], end_date: Optional[str],
+                     date_format: Optional[str] = None) -> "np.ndarray":
+    """Mask of the values that parse to dates within [start_date, end_date]"""
+    import pandas as pd
+    from ml.columnar import parse_date_bound, parse_dates
+    
+    dates = parse_dates(pd.Series(values), date_format, errors="coerce")
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        # Mixed UTC offsets only compare once converted to a single zone
+        dates = pd.to_datetime(pd.Series(values), errors="coerce", utc=True)
+    timezone = str(dates.dt.tz) if dates.dt.tz is not None else None
+    
+    mask = dates.notna()
+    if start_date:
+        mask &= dates >= parse_date_bound(start_date, timezone)
+    if end_date:
+        mask &= dates <= parse_date_bound(end_date, timezone)
+    return mask.to_numpy()
@@ -0,0 +1,179 @@
+import hashlib
+import math
+import os
+from typing import Optional, Dict, Any, Iterator, List, TYPE_CHECKING
+
+import numpy as np
+
+from ml.columnar import ColumnarDataset, ColumnarWriter
+from ml.statistics import RunningStats, TDigest
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Quantile digest compression: a digest keeps about compression / 2.5 centroids
+# per column; 500 puts percentile estimates within ~0.02% of the true rank
+SKETCH_COMPRESSION = float(os.getenv("DATASET_SKETCH_COMPRESSION", "500"))
+
+
+class ColumnState:
+    """Mergeable summary of a numeric column: running moments and a quantile digest.
+
+    Built chunk by chunk during ingestion and persisted with the dataset, so
+    percentiles are answered, and rows appended later folded in, without
+    reading the stored rows again.
+    """
+
+    def __init__(self, moments: Optional[RunningStats] = None, digest: Optional[TDigest] = None):
+        self.moments = moments or RunningStats()
+        self.digest = digest or TDigest(SKETCH_COMPRESSION)
+
+    def update(self, values: np.ndarray):
+        """Add a chunk of values (NaN values are skipped)"""
+        self.moments.update(values)
+        self.digest.update(values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"moments": self.moments.to_dict(), "digest": self.digest.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "ColumnState":
+        return cls(RunningStats.from_dict(state["moments"]), TDigest.from_dict(state["digest"]))
+
+
+def statistics_summary(states: Dict[str, ColumnState]) -> Dict[str, Any]:
+    """The dataset's statistics block (the median is the digest estimate)"""
+    return {
+        "mean": {name: s.moments.mean if s.moments.count else math.nan for name, s in states.items()},
+        "median": {name: s.digest.quantile(0.5) for name, s in states.items()},
+        "std": {name: s.moments.std for name, s in states.items()},
+        "min": {name: s.moments.min if s.moments.count else math.nan for name, s in states.items()},
+        "max": {name: s.moments.max if s.moments.count else math.nan for name, s in states.items()}
+    }
+
+
+class DatasetIngest:
+    """Turns a stream of dataframe chunks into a stored dataset.
+
+    Each call to next_chunk consumes one chunk of rows: it returns the chunk
+    document for the dataset_chunks collection and, along the way, appends
+    the typed columns to the columnar copy, updates the running statistics
+    and the content hash. Only one chunk is held at a time. The work is
+    synchronous and CPU-bound; DataService runs each step in a worker thread.
+
+    Given a stored dataset document, the chunks are appended to that dataset
+    instead: chunk numbers, the columnar copy, the statistics and the content
+    hash all continue from the stored state, so only the new rows are read.
+    The frames must then have the dataset's columns, in order.
+    """
+
+    def __init__(self, dataset_id: str, frames: Iterator["pd.DataFrame"], schema: List[Dict[str, Any]],
+                 date_column: Optional[str], store_path: str, dataset: Optional[Dict[str, Any]] = None):
+        self.dataset_id = dataset_id
+        self.schema = [dict(entry) for entry in schema]
+        self.date_column = date_column
+        self.store_path = store_path
+        self.row_count = 0
+        self.chunk_count = 0
+        self.columns: List[str] = []
+        self.preview: List[Dict[str, Any]] = []
+        self.value_columns: Optional[List[str]] = None
+        self._frames = frames
+        self._states: Dict[str, ColumnState] = {}
+        self._hasher = hashlib.sha256()
+        date_format = next((entry["format"] for entry in schema if entry["name"] == date_column), None)
+
+        if dataset is None:
+            self._writer: Optional[ColumnarWriter] = ColumnarWriter(store_path, date_column, date_format)
+            return
+
+        self.row_count = dataset["rowCount"]
+        self.chunk_count = dataset["storage"]["chunkCount"]
+        self.columns = list(dataset["columns"])
+        self.preview = dataset.get("dataPreview", [])
+        self.value_columns = list(dataset.get("valueColumns", []))
+        self._states = {name: ColumnState.from_dict(state) for name, state in dataset["statisticsState"].items()}
+        # Chained from the previous hash: it changes with every append
+        self._hasher.update(dataset["contentHash"].encode("utf-8"))
+        # Without a columnar copy on this host there is nothing to extend
+        base = ColumnarDataset.open(store_path) if dataset["storage"].get("columnar") else None
+        self._writer = ColumnarWriter(store_path, date_column, date_format, base=base) if base is not None else None
+
+    def next_chunk(self) -> Optional[Dict[str, Any]]:
+        """Process the next chunk of rows, returning its chunk document (None when done)"""
+        import pandas as pd
+
+        df = next(self._frames, None)
+        if df is None:
+            return None
+
+        if self.chunk_count == 0:
+            self.columns = df.columns.tolist()
+            self.preview = df.head(10).to_dict("records")
+            self._hasher.update(",".join(map(str, df.columns)).encode("utf-8"))
+        if self.value_columns is None:
+            self.value_columns = [
+                name for name in df.columns
+                if name != self.date_column and pd.api.types.is_numeric_dtype(df[name]) and not pd.api.types.is_bool_dtype(df[name])
+            ]
+
+        if self._writer is not None:
+            self._writer.append(df)
+        for name in list(self.value_columns):
+            if not pd.api.types.is_numeric_dtype(df[name]) or pd.api.types.is_bool_dtype(df[name]):
+                # Text further down: no longer a value column, as in the columnar copy
+                self.value_columns.remove(name)
+                self._states.pop(name, None)
+                continue
+            self._states.setdefault(name, ColumnState()).update(df[name].to_numpy(dtype=float))
+
+        # The schema was inferred from a sample of the first chunk; keep nullability exact
+        nulls = df.isna().any().to_numpy()
+        for entry, has_nulls, column in zip(self.schema, nulls, df.columns):
+            entry["nullable"] = entry["nullable"] or bool(has_nulls)
+            if entry["dtype"] == "integer" and not pd.api.types.is_integer_dtype(df[column]):
+                entry["dtype"] = "float"
+        self._hasher.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+
+        # Columns are keyed by position (column names may contain dots or "$",
+        # which Mongo field paths cannot), so a column subset is a server-side
+        # projection on "columns.<position>"
+        chunk = {
+            "datasetId": self.dataset_id,
+            "chunk": self.chunk_count,
+            "rowStart": self.row_count,
+            "rowCount": len(df),
+            "columns": {str(position): df.iloc[:, position].tolist() for position in range(len(df.columns))}
+        }
+        self.row_count += len(df)
+        self.chunk_count += 1
+        return chunk
+
+    def finish(self) -> Dict[str, Any]:
+        """Close the columnar copy and get the dataset document fields describing the data"""
+        schema = self._writer.close() if self._writer is not None else None
+        value_columns = list(self.value_columns or [])
+        for entry in self.schema:
+            if entry["dtype"] in ("integer", "float") and entry["name"] not in value_columns:
+                # Numeric in the sample, text further down
+                entry["dtype"] = "string"
+        states = {name: self._states.get(name, ColumnState()) for name in value_columns}
+
+        return {
+            "rowCount": self.row_count,
+            "columnCount": len(self.columns),
+            "columns": self.columns,
+            "schema": self.schema,
+            "valueColumns": value_columns,
+            "contentHash": self._hasher.hexdigest(),
+            "dataPreview": self.preview,
+            "chunkCount": self.chunk_count,
+            "columnar": {"format": "npy", "dateColumn": schema["dateColumn"], "columns": list(schema["columns"])} if schema else None,
+            "statistics": statistics_summary(states),
+            "statisticsState": {name: state.to_dict() for name, state in states.items()}
+        }
+
+    def abort(self):
+        """Discard the columnar rows written so far"""
+        if self._writer is not None:
+            self._writer.abort()
@@ -0,0 +1,214 @@
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+from datetime import datetime
+from collections import OrderedDict
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import uuid
+
+try:
+    from websocket_manager import manager
+    HAS_WEBSOCKET = True
+except ImportError:
+    HAS_WEBSOCKET = False
+
+logger = logging.getLogger(__name__)
+
+JOB_TOPIC = "prediction_jobs"
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+# A job runner receives a progress callback (stage, percent) and returns the result
+ProgressCallback = Callable[[str, int], Awaitable[None]]
+JobRunner = Callable[[ProgressCallback], Awaitable[Dict[str, Any]]]
+
+
+class PredictionJobScheduler:
+    """Bounded-concurrency job scheduler with priorities and per-user fairness.
+
+    Jobs are picked by priority, then submission order, skipping users who
+    already have their maximum number of jobs running. Status changes (job ID,
+    status and progress only) are pushed to WebSocket clients subscribed to
+    the prediction_jobs topic.
+    """
+
+    def __init__(self):
+        self.max_concurrent = int(os.getenv("PREDICTION_JOB_CONCURRENCY", "4"))
+        self.per_user_limit = int(os.getenv("PREDICTION_JOB_USER_LIMIT", "2"))
+        self.history_size = int(os.getenv("PREDICTION_JOB_HISTORY", "1000"))
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._runners: Dict[str, JobRunner] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+        self._running_per_user: Dict[str, int] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the dispatcher loop"""
+        if self._dispatcher:
+            return
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        logger.info(f"Prediction job scheduler started ({self.max_concurrent} concurrent, {self.per_user_limit} per user)")
+
+    async def stop(self):
+        """Stop the dispatcher and cancel running jobs"""
+        if not self._dispatcher:
+            return
+        self._dispatcher.cancel()
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(self._dispatcher, *self._tasks.values(), return_exceptions=True)
+        self._dispatcher = None
+        logger.info("Prediction job scheduler stopped")
+
+    async def submit(self, user_id: str, runner: JobRunner, priority: str = "normal",
+                     metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Queue a job and return its record immediately"""
+        job = {
+            "id": str(uuid.uuid4()),
+            "userId": user_id,
+            "priority": priority if priority in PRIORITIES else "normal",
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0,
+            "metadata": metadata or {},
+            "result": None,
+            "error": None,
+            "createdAt": datetime.utcnow().isoformat(),
+            "startedAt": None,
+            "finishedAt": None
+        }
+        self.jobs[job["id"]] = job
+        self._runners[job["id"]] = runner
+        heapq.heappush(self._queue, (PRIORITIES[job["priority"]], next(self._sequence), job["id"]))
+        self._prune_history()
+
+        await self._publish(job)
+        if self._wakeup:
+            self._wakeup.set()
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+
+    def get_jobs(self, user_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get the most recent jobs, optionally for one user"""
+        jobs = [job for job in reversed(self.jobs.values()) if user_id is None or job["userId"] == user_id]
+        return jobs[:limit]
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job"""
+        job = self.jobs.get(job_id)
+        if not job or job["status"] not in ("queued", "running"):
+            return False
+
+        if job_id in self._tasks:
+            self._tasks[job_id].cancel()
+        else:
+            # Still queued: the dispatcher skips cancelled jobs when popping
+            self._runners.pop(job_id, None)
+            await self._finish(job, "cancelled")
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+        return {
+            "maxConcurrent": self.max_concurrent,
+            "perUserLimit": self.per_user_limit,
+            "running": len(self._tasks),
+            "queued": statuses.get("queued", 0),
+            "statuses": statuses
+        }
+
+    async def _dispatch(self):
+        """Start queued jobs whenever a slot frees up"""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            deferred = []
+            while self._queue and len(self._tasks) < self.max_concurrent:
+                entry = heapq.heappop(self._queue)
+                job = self.jobs.get(entry[2])
+                if not job or job["status"] != "queued":
+                    continue
+                if self._running_per_user.get(job["userId"], 0) >= self.per_user_limit:
+                    # Fairness: leave this user's job queued, let others run
+                    deferred.append(entry)
+                    continue
+                self._start(job)
+
+            for entry in deferred:
+                heapq.heappush(self._queue, entry)
+
+    def _start(self, job: Dict[str, Any]):
+        job["status"] = "running"
+        job["startedAt"] = datetime.utcnow().isoformat()
+        self._running_per_user[job["userId"]] = self._running_per_user.get(job["userId"], 0) + 1
+        self._tasks[job["id"]] = asyncio.create_task(self._run(job, self._runners.pop(job["id"])))
+
+    async def _run(self, job: Dict[str, Any], runner: JobRunner):
+        async def report(stage: str, progress: int):
+            job["stage"] = stage
+            job["progress"] = progress
+            await self._publish(job)
+
+        try:
+            await report("starting", 0)
+            job["result"] = await runner(report)
+            await self._finish(job, "completed")
+        except asyncio.CancelledError:
+            await self._finish(job, "cancelled")
+        except Exception as e:
+            logger.error(f"Prediction job {job['id']} failed: {e}")
+            job["error"] = getattr(e, "detail", None) or str(e)
+            await self._finish(job, "failed")
+        finally:
+            self._tasks.pop(job["id"], None)
+            self._running_per_user[job["userId"]] -= 1
+            if self._wakeup:
+                self._wakeup.set()
+
+    async def _finish(self, job: Dict[str, Any], status: str):
+        job["status"] = status
+        job["stage"] = status
+        if status == "completed":
+            job["progress"] = 100
+        job["finishedAt"] = datetime.utcnow().isoformat()
+        await self._publish(job)
+
+    async def _publish(self, job: Dict[str, Any]):
+        """Push a job's status to subscribed WebSocket clients.
+        
+        The WebSocket is not authenticated, so only the job ID, status and
+        progress are sent; the owner fetches details and results through the
+        authorized /api/predict/jobs/{job_id} endpoint.
+        """
+        if not HAS_WEBSOCKET:
+            return
+        update = {"jobId": job["id"], "status": job["status"], "progress": job.get("progress")}
+        await manager.broadcast(json.dumps({
+            "type": JOB_TOPIC,
+            "data": update,
+            "timestamp": datetime.now().isoformat()
+        }), JOB_TOPIC)
+
+    def _prune_history(self):
+        """Forget the oldest finished jobs beyond the history size"""
+        excess = len(self.jobs) - self.history_size
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self.jobs.items()
+                       if job["status"] in ("completed", "failed", "cancelled")][:excess]:
+            del self.jobs[job_id]
+
+
+# Global scheduler instance
+job_scheduler = PredictionJobScheduler()
@@ -0,0 +1,114 @@
+import warnings
+from typing import Optional, Dict, Any, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Values profiled per column, spread evenly over the first chunk of the upload
+SAMPLE_ROWS = 1000
+
+# Column names that make a column the preferred date column
+DATE_KEYWORDS = ('date', 'time', 'timestamp', 'datetime', 'period', 'month', 'year', 'day')
+
+# Share of sampled values a datetime format must parse for the column to be a date
+DATE_MATCH_RATIO = 0.99
+
+
+def _guess_datetime_format(value: str, dayfirst: bool) -> Optional[str]:
+    try:
+        from pandas.tseries.api import guess_datetime_format
+    except ImportError:  # public from pandas 2.2
+        from pandas._libs.tslibs.parsing import guess_datetime_format
+    with warnings.catch_warnings():
+        # Warns when the guess contradicts dayfirst; both orders are tried anyway
+        warnings.simplefilter("ignore")
+        return guess_datetime_format(value, dayfirst=dayfirst)
+
+
+def _sample(column: "pd.Series", size: int = SAMPLE_ROWS) -> "pd.Series":
+    """Up to size non-null values spread evenly over a column"""
+    values = column.dropna()
+    if len(values) > size:
+        values = values.iloc[::-(-len(values) // size)]
+    return values
+
+
+def infer_date_format(sample: "pd.Series") -> Optional[str]:
+    """Find one datetime format that parses (nearly) every sampled value.
+
+    Candidates are guessed from a few values spread over the sample, month
+    first and day first (so 13/02/2024 settles the ambiguity), with ISO 8601
+    of varying precision as a last resort. Returns None if none fits.
+    """
+    import pandas as pd
+
+    values = sample.astype(str)
+    if values.empty:
+        return None
+
+    candidates: List[str] = []
+    for value in values.iloc[::max(1, len(values) // 5)].iloc[:5]:
+        for dayfirst in (False, True):
+            guessed = _guess_datetime_format(value, dayfirst)
+            if guessed and guessed not in candidates:
+                candidates.append(guessed)
+    candidates.append("ISO8601")
+
+    for date_format in candidates:
+        parsed = pd.to_datetime(values, format=date_format, errors="coerce")
+        if parsed.notna().mean() >= DATE_MATCH_RATIO:
+            return date_format
+    return None
+
+
+def infer_schema(df: "pd.DataFrame") -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Infer each column's type from a bounded sample, and pick the date column.
+
+    Text columns (and integer columns named like dates, e.g. 20240131) are
+    dates when a single format parses their sample. Numbers are never taken
+    for dates otherwise. The date column is the first date column with a date
+    keyword in its name, or else the first date column.
+
+    Returns the schema, one {name, dtype, format, nullable} entry per column
+    in order (dtype: datetime, integer, float, boolean or string), and the
+    date column.
+    """
+    import pandas as pd
+
+    schema = []
+    candidates = []
+    for position, name in enumerate(df.columns):
+        column = df[name]
+        keyword = any(keyword in str(name).lower() for keyword in DATE_KEYWORDS)
+
+        date_format = None
+        if pd.api.types.is_bool_dtype(column):
+            dtype = "boolean"
+        elif pd.api.types.is_datetime64_any_dtype(column):
+            dtype = "datetime"
+        elif pd.api.types.is_integer_dtype(column):
+            dtype = "integer"
+        elif pd.api.types.is_float_dtype(column):
+            dtype = "float"
+        else:
+            dtype = "string"
+
+        if dtype == "string" or (dtype == "integer" and keyword):
+            date_format = infer_date_format(_sample(column))
+            if date_format:
+                dtype = "datetime"
+
+        if dtype == "datetime":
+            candidates.append((not keyword, position, name))
+        schema.append({"name": name, "dtype": dtype, "format": date_format, "nullable": bool(column.isna().any())})
+
+    date_column = min(candidates)[2] if candidates else None
+    return schema, date_column
+
+
+def schema_date_format(dataset: Dict[str, Any], column: str) -> Optional[str]:
+    """The inferred datetime format of a dataset column, if any"""
+    for entry in dataset.get("schema") or []:
+        if entry["name"] == column:
+            return entry.get("format")
+    return None